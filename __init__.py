@@ -1,6 +1,6 @@
 import curses
-from frame import Frame, FrameModification
-from animations import Anim, AnimIterator
+from frame import Frame, HeadlessFrame, FrameModification, DrawOp, DrawBatch
+from animations import Anim, AnimIterator, Composition, Sequence
 from primitives import *
 from anim_player import play
 
@@ -9,14 +9,13 @@ from random import randint, choice
 
 
 def initialize_curses_colors():
-    """Initialize the color support of curses (256 colors)."""
+    """Initialize the color support of curses (256 colors).
+    The color pairs are not defined here : each frame defines them when a
+    color is first used (see *colors.ColorManager*).
+    """
     curses.curs_set(0)  # hide the cursor
     curses.start_color()
     curses.use_default_colors()
-    # set color_pair for each color
-    for i in range(curses.COLORS):
-        curses.init_pair(i, i, -1)
-        # curses.init_pair(i + 256, i,)
 
 def screen_saver(fr):
     dot1 = Anim(fr, fadeinout(10, 10, "•"))
@@ -1,24 +1,110 @@
-from time import time
+from time import perf_counter
 from animations import Anim
+from scheduler import FrameScheduler, PlaybackStats
+from lookahead import Lookahead
+from optimizer import compile_animation
 
 FRAME_DELAY = 0.02
 
 
-def play(frame, animation):
+def play(frame, animation, fps: float = 1 / FRAME_DELAY, lookahead: int = 0,
+         profiler=None, optimize: bool = True):
+    """Play an animation on the frame.
+    Args:
+        frame (Frame): The frame to play the animation on.
+        animation (Anim or function): The animation to play.
+        fps (float): The target number of frames per second. Frames that are
+                     late are dropped instead of slowing the animation down.
+                     If None, or if the frame is not shown in real time
+                     (like a *HeadlessFrame*), the animation is played as
+                     fast as possible.
+        lookahead (int): If not 0, the steps are computed in a background
+                         thread, up to *lookahead* steps ahead, while the
+                         player applies the modifications and waits.
+        profiler (Profiler): If given, records the time taken by each frame
+                             (see *profiling.Profiler*). It can not be used
+                             with *lookahead*, since the steps would then be
+                             measured on another thread than the frames.
+        optimize (bool): Compile the animation before playing it, if it has
+                         not started yet (see *optimizer.compile_animation*).
+    Returns:
+        PlaybackStats: The number of rendered and dropped frames, the worst
+                       lateness of a frame, and how many times no step was
+                       ready in lookahead mode.
+    Raises:
+        ValueError: If both *lookahead* and *profiler* are given.
+    """
+    if lookahead and profiler is not None:
+        raise ValueError("A profiler can not be used with lookahead")
     # ensure that animation is an *Anim* object
     if isinstance(animation, Anim):
         anim = animation
     else:
         anim = Anim(frame, animation)
-    # the animation loop
-    for modif_list in anim:
-        time_before_modifs = time()
-        for modif in modif_list:
-            modif(frame)
-        # refresh only after all the modifications
-        frame.refresh()
-        # wait as long as needed so the frame is here for *FRAME_DELAY*
-        while time() < FRAME_DELAY + time_before_modifs:
-            pass
+    if optimize and not anim.started():
+        anim = compile_animation(anim)
+    if profiler is not None:
+        anim.instrument(profiler)
+    if fps is None or not frame.realtime:
+        scheduler = None
+        stats = PlaybackStats()
+    else:
+        scheduler = FrameScheduler(fps)
+        stats = scheduler.stats
+        scheduler.start()
+    steps = Lookahead(anim, lookahead) if lookahead else anim
+    try:
+        waited = perf_counter()
+        # the modifications of a dropped frame are not on the screen yet
+        pending = False
+        # the animation loop
+        for modif_list in steps:
+            if frame.poll_resize():
+                # show the cells exposed by the resize straight away
+                frame.refresh()
+                pending = False
+            if not modif_list:
+                # nothing changes, for one step or for a whole Idle duration :
+                # sleep until the next step, with no refresh
+                ticks = getattr(modif_list, "ticks", 1)
+                stats.frames_idle += ticks
+                if pending:
+                    frame.refresh()
+                    pending = False
+                frame.idle(ticks)
+                if scheduler is not None:
+                    scheduler.wait(ticks)
+                if profiler is not None:
+                    waited = perf_counter()
+                continue
+            if profiler is not None:
+                computed = perf_counter()
+            frame.apply(modif_list)
+            if profiler is not None:
+                applied = perf_counter()
+            # refresh only after all the modifications, and only if the frame
+            # is not already late (its modifications are then shown with the
+            # next one)
+            rendered = scheduler is None or scheduler.should_render()
+            if rendered:
+                frame.refresh()
+            pending = not rendered
+            if profiler is not None:
+                profiler.end_frame(
+                    computed - waited, applied - computed,
+                    perf_counter() - applied if rendered else None,
+                    len(modif_list))
+            if scheduler is None:
+                stats.frames_rendered += 1
+            else:
+                scheduler.wait()
+            if profiler is not None:
+                waited = perf_counter()
+    finally:
+        if lookahead:
+            steps.close()
+            stats.queue_underruns = steps.underruns
+    # show the modifications of the dropped frames at the end
+    frame.refresh()
     frame.pause()
-
+    return stats
@@ -4,10 +4,143 @@ It is NOT responsible for defining what is a frame, or what an animation should
 It only defines a very general *Anim* object.
 
 """
+import sys
+from types import (AsyncGeneratorType, BuiltinFunctionType, FunctionType,
+                   GeneratorType, MethodType, ModuleType)
 from typing import Type
-from itertools import zip_longest, chain, tee
+from itertools import chain
+from time import perf_counter
+from heapq import heappush, heappop
+from bisect import insort, bisect_right
 import curses
-from frame import FrameModification
+from frame import FrameModification, DrawOp, DrawBatch
+
+
+def deep_sizeof(obj, seen: set = None) -> int:
+    """Return the approximate number of bytes held by *obj* and by what it
+    references : containers, objects attributes, and local variables of
+    suspended generators. Functions, classes and modules are shared, so they
+    are not counted.
+    Args:
+        obj: The object to measure.
+        seen (set): The ids of the objects that must not be counted.
+    Returns:
+        int: The number of bytes.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, (type, ModuleType, FunctionType,
+                                           BuiltinFunctionType, MethodType)):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        children = chain(obj.keys(), obj.values())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        children = obj
+    elif isinstance(obj, GeneratorType):
+        children = () if obj.gi_frame is None else obj.gi_frame.f_locals.values()
+    elif hasattr(obj, "__dict__"):
+        children = vars(obj).values()
+    else:
+        children = ()
+    return size + sum(deep_sizeof(child, seen) for child in children)
+
+
+INFINITY = float("inf")
+
+
+def cover(intervals: list, start: int, stop: int) -> bool:
+    """Add the interval [start, stop) to the sorted list of disjoint
+    *intervals*, merging the ones that touch it.
+    Returns:
+        bool: False if the interval was already entirely in *intervals*.
+    """
+    index = bisect_right(intervals, (start, INFINITY))
+    if index > 0 and intervals[index - 1][1] >= start:
+        if intervals[index - 1][1] >= stop:
+            return False
+        index -= 1
+        start = intervals[index][0]
+    end = index
+    while end < len(intervals) and intervals[end][0] <= stop:
+        stop = max(stop, intervals[end][1])
+        end += 1
+    intervals[index:end] = [(start, stop)]
+    return True
+
+
+def cover_lines(covered: dict, y: int, x: int, string: str) -> bool:
+    """Add the cells of a string with newlines, written at (y, x), to the
+    *covered* intervals of each line (each of its lines is written at the
+    column *x*, see *ScreenBuffer.write*).
+    Returns:
+        bool: False if all the cells were already covered.
+    """
+    added = False
+    for dy, line in enumerate(string.split("\n")):
+        if line and cover(covered.setdefault(y + dy, []), x, x + len(line)):
+            added = True
+    return added
+
+
+def cull_hidden(modifications: list) -> list:
+    """Remove the draw ops that are entirely drawn over by the draw ops that
+    come after them in *modifications*. The result draws the same thing.
+    The modifications that are functions of the frame are opaque : they may
+    depend on what was drawn before them (the cursor position for example),
+    so nothing before the last of them is removed.
+    Args:
+        modifications (list[FrameModification]): The modifications of a step.
+    Returns:
+        list[FrameModification]: The modifications that are not hidden.
+    """
+    # line -> sorted list of the [start, stop) intervals drawn over
+    covered = {}
+    kept = []
+    for index in range(len(modifications) - 1, -1, -1):
+        modif = modifications[index]
+        kind = type(modif)
+        if kind is DrawOp:
+            y, x, string = modif[0], modif[1], modif[2]
+            if "\n" in string:
+                # hidden only if all of its lines are
+                if not cover_lines(covered, y, x, string):
+                    continue
+            else:
+                intervals = covered.get(y)
+                if intervals is None:
+                    covered[y] = [(x, x + len(string))]
+                elif not cover(intervals, x, x + len(string)):
+                    continue
+        elif kind is DrawBatch:
+            for y, x, string in zip(modif.ys, modif.xs, modif.strings):
+                if "\n" in string:
+                    cover_lines(covered, y, x, string)
+                else:
+                    cover(covered.setdefault(y, []), x, x + len(string))
+        else:
+            return modifications[:index + 1] + kept[::-1]
+        kept.append(modif)
+    kept.reverse()
+    return kept
+
+
+class Idle(list):
+    """A step where nothing is drawn, that lasts *ticks* steps.
+    It is an empty list, so it can be used as the (empty) list of
+    modifications of a step, but the players and the compositions know that
+    nothing changes until its end, so they do not have to go through each
+    of its steps.
+    """
+
+    def __init__(self, ticks: int = 1) -> None:
+        super().__init__()
+        self.ticks = int(ticks)
+
+    def __repr__(self) -> str:
+        return f"Idle({self.ticks})"
+
 
 class AnimIterator:
     def __init__(self, anim) -> None:
@@ -23,6 +156,9 @@ class AnimIterator:
 
 
 class Anim:
+    # the Profiler that records the time taken by the layers, see *instrument*
+    profiler = None
+
     def __init__(self, frame, animation, after: int = 0) -> None:
         """Initialize the object.
         Args:
@@ -45,6 +181,12 @@ class Anim:
         """
         # the frame of the animation
         self.frame = frame
+        # the delay before the animation starts
+        if not isinstance(after, int):
+            raise TypeError(
+                f"The *after* parameter must be an int, not a {type(after)}")
+        if after < 0:
+            raise ValueError("The *after* parameter must be positive")
         # the animation function
         if isinstance(animation, Anim):
             # If *animation* is already an *Anim* objec, then just copy it.
@@ -54,36 +196,99 @@ class Anim:
             # animations with the same function, they do not share the same
             # generator.
             # This means that you may use Anim to actually copy an animation.
+            # The copy starts from the beginning, with the delay of *animation*
+            # added to *after*.
             self.__anim_function__ = animation.__anim_function__
-            animation.__anim_generator__, self.__anim_generator__ = tee(animation.__anim_generator__)
+            after += animation.__delay__
         else:
             self.__anim_function__ = animation
-            self.__anim_generator__ = tee(animation(self.frame))[0]
-        # create the animation generator (animation function once called)
-        # self.reset_animation()
-        # the delay before the animation starts
-        if not isinstance(after, int):
+        self.__delay__ = int(after)
+        self.restart()
+
+    def restart(self) -> None:
+        """Restart the animation from its beginning, with its delay.
+        The generator is created again from the animation function (when the
+        first step is asked), so nothing is kept from the previous run.
+        """
+        self.__after__ = self.__delay__
+        self.__anim_generator__ = None
+
+    def started(self) -> bool:
+        """Tell if the animation was asked for at least one step since it was
+        created or restarted."""
+        return (self.__anim_generator__ is not None
+                or self.__after__ != self.__delay__)
+
+    def clone(self):
+        """Return a copy of the animation, that starts from its beginning.
+        The copy and the original do not share anything but the animation
+        function, so they can be played independently.
+        Returns:
+            Anim: The copy.
+        """
+        return Anim(self.frame, self)
+
+    def delayed(self, delay: int):
+        """Return a copy of the animation, delayed by *delay* more steps.
+        Args:
+            delay (int): The number of steps to add to the delay.
+        Returns:
+            Anim: The copy (or the animation itself if *delay* is 0).
+        """
+        if delay == 0:
+            return self
+        return Anim(self.frame, self, after=delay)
+
+    def prepare(self) -> None:
+        """Create the generator of the animation now, instead of when its
+        first step is asked. Calling a generator function runs nothing, but
+        an animation function that works when it is called (like
+        *parallel.ProcessLayer*, that starts a worker process) starts now.
+        """
+        if self.__anim_generator__ is None:
+            self.__anim_generator__ = self.__make_generator__()
+
+    def __make_generator__(self):
+        """Create the generator of the animation from its function.
+        Raises:
+            TypeError: If the function is an async generator function, that
+                       can only be played on its own by *async_player*.
+        """
+        generator = self.__anim_function__(self.frame)
+        if isinstance(generator, AsyncGeneratorType):
+            name = getattr(self.__anim_function__, "__name__", "?")
             raise TypeError(
-                f"The *after* parameter must be an int, not a {type(after)}")
-        if after < 0:
-            raise ValueError("The *after* parameter must be positive")
-        self.__after__ = int(after)
+                f"The async animation function {name} can only be played on "
+                "its own by async_player.play_async, not composed or "
+                "concatenated with other animations")
+        return iter(generator)
 
-    # def reset_animation(self) -> None:
-    #     """Reset the animation. This restart the animation and removes any
-    #     delay that it could have before starting.
-    #     This can used both to initialize the object, in *Anim.__init__*, and to
-    #     reset an animation, since it creates/overrides the
-    #     *Anim.__anim_generator__* attribute.
-    #     """
-    #     self.__anim_generator__ = self.__anim_function__(self.frame)
+    def instrument(self, profiler) -> None:
+        """Record the time taken by the layers of the animation (and of the
+        animations it is made of) in *profiler*, or stop recording it if
+        *profiler* is None.
+        Args:
+            profiler (Profiler): The profiler.
+        """
+        self.profiler = profiler
+
+    def memory_footprint(self) -> int:
+        """Return the approximate number of bytes held by the animation : the
+        object itself, the state of its generator and of the animations it
+        is made of. The frame and the functions are not counted.
+        This can be used to check that a long running animation does not keep
+        growing in memory.
+        Returns:
+            int: The number of bytes.
+        """
+        return deep_sizeof(self, {id(self.frame)})
 
     def __call__(self, frame):
         """Calling the Anim object is the same as calling its animation function.
         The definition speaks by itself :
         return self.__anim_function__(frame)
         """
-        return tee(self.__anim_function__(frame))
+        return self.__anim_function__(frame)
 
     def __iter__(self):
         """Returns the iterable version of an animation.
@@ -98,45 +303,24 @@ class Anim:
             list[FrameModification]: The list of modifications to make to the frame.
         """
         if self.__after__ > 0:
-            self.__after__ -= 1
-            return []
-        try:
-            modifications = next(self.__anim_generator__)
-            # ensure that the returned value is a list
-            if isinstance(modifications, list):
-                return modifications
-            else:
-                return [modifications]
-        except StopIteration:
-            raise StopIteration
+            # the whole delay is one idle step
+            ticks, self.__after__ = self.__after__, 0
+            return Idle(ticks)
+        if self.__anim_generator__ is None:
+            self.__anim_generator__ = self.__make_generator__()
+        # raises StopIteration when the animation is finished
+        modifications = next(self.__anim_generator__)
+        # ensure that the returned value is a list
+        if isinstance(modifications, list):
+            return modifications
+        else:
+            return [modifications]
 
-    def __compose_with__(self, other):
-        """Compose with another animation.
-        Args:
-            other (Anim): The animation to add over the current one.
-        Returns:
-            generator: The new animation formed with composing *self* and *other*.
-        Warning: This method returns a generator, so the >> operator is the
-                 preferred method to compose animations, since it returns an
-                 Anim object.
-        """
-        def composed_animation(frame):
-            """This is a closure.
-            It is used to create a new generator, so the two composed
-            generators are stil independant and are not linked with the new one
-            composed.
-            If you don't take care of that, using the new generator will change
-            the two others each time you call next on the composed generator.
-            This function is a closure because you want to return a function,
-            not a generator (a generator is the function once called).
-            """
-            for s, o in zip_longest(self, other, fillvalue=[]):
-                if not isinstance(s, list):
-                    s = [s]
-                if not isinstance(o, list):
-                    o = [o]
-                yield s + o
-        return composed_animation
+    def __as_layers__(self) -> list:
+        """Return the list of layers that this animation is made of, from the
+        bottom one to the top one. For a simple animation, it is only itself.
+        """
+        return [self]
 
     def __rshift__(self, other):
         """The >> operator is used to compose two animations.
@@ -150,7 +334,10 @@ class Anim:
         """
         if not isinstance(other, Anim):
             other = Anim(self.frame, other)
-        return Anim(self.frame, self.__compose_with__(other))
+        # the layers are kept in one flat list, so that a chain of >> does not
+        # nest one composition into another
+        return Composition(self.frame,
+                           self.__as_layers__() + other.__as_layers__())
 
     def __lshift__(self, other):
         """The << operator is used to compose two animations.
@@ -169,33 +356,11 @@ class Anim:
         return other >> self
 
 
-    def __concatenate_with__(self, other):
-        """Return a new animation generator that is *self* then *other* : both
-        animations are played, but one by one."""
-        def concatenated_animation(frame):
-            """This is a closure.
-            It is used to create a new generator, so the two concatenated
-            generators are stil independent and are not linked with the new one
-            created by concatenation.
-            If you don't take care of that, using the new generator will change
-            the two others each time you call next on the new generator.
-            This function is a closure because you want to return a function,
-            not a generator (a generator is the function once called).
-            """
-            self_generator = self(frame)
-            other_generator = other(frame)
-            i = 0
-            for self_item in self_generator:
-                yield self_item
-                i += 1
-            assert i > 0
-            i = 0
-            for other_item in other_generator:
-                yield other_item
-                i += 1
-            assert i > 0
-        return concatenated_animation
-
+    def __as_segments__(self) -> list:
+        """Return the list of animations that are played one by one to play
+        this animation. For a simple animation, it is only itself.
+        """
+        return [self]
 
     def __and__(self, other):
         """The & operator is used to concatenate two animations.
@@ -207,8 +372,241 @@ class Anim:
         Returns:
             Anim: The new animation that is *self* then *other*.
         """
-        other = Anim(self.frame, other)
-        return Anim(self.frame, self.__concatenate_with__(other))
+        if isinstance(other, Sequence):
+            other_segments = other.__as_segments__()
+        elif isinstance(other, Anim):
+            other_segments = [other]
+        else:
+            other_segments = [Anim(self.frame, other)]
+        # the segments are kept in one flat list, so that a chain of & does not
+        # nest one generator into another
+        return Sequence(self.frame, self.__as_segments__() + other_segments)
+
+
+
+class Composition(Anim):
+    # remove the writes that are drawn over by upper layers in the same step
+    culling = True
+
+    def __init__(self, frame, layers: list, after: int = 0) -> None:
+        """Initialize the object.
+        A composition plays all its layers at the same time. The layers are
+        kept in one ordered list, from the bottom one to the top one, and the
+        layers that are finished are removed from it. So the cost of a step
+        only depends on the number of layers that are still running.
+        Args:
+            layers (list[Anim]): The layers, from the bottom one to the top one.
+            after (int): The delay before the animation starts.
+        """
+        self.layers = list(layers)
+        super().__init__(frame, self.__composed_animation__, after)
+
+    def clone(self):
+        """Return a copy of the composition, that starts from its beginning."""
+        return Composition(self.frame, self.layers, self.__delay__)
+
+    def __as_layers__(self) -> list:
+        """Return the layers of the composition, so that composing it again
+        only extends the list of layers.
+        A delayed composition is kept as one layer, since its layers do not
+        start at the same time as the new ones.
+        """
+        if self.__delay__ > 0:
+            return [self]
+        return self.layers
 
+    def delayed(self, delay: int):
+        """Return a copy of the composition, delayed by *delay* more steps."""
+        if delay == 0:
+            return self
+        return Composition(self.frame, self.layers, self.__delay__ + delay)
 
+    def __composed_animation__(self, frame):
+        """Play all the layers at the same time.
+        The modifications of each step are given in the order of the layers, so
+        the upper layers are drawn over the lower ones.
+        The layers are cloned, so playing the composition does not consume the
+        animations it is made of.
+        The delay of a layer is an offset : the layer is not asked for any
+        step before it starts.
+        """
+        profiler = self.profiler
+        # (order, layer) of the running layers, sorted by order
+        active = []
+        # heap of (start, order, layer) of the layers that did not start yet
+        waiting = []
+        # order -> name of the layer, for the profiler
+        names = {}
+        for order, layer in enumerate(self.layers):
+            layer = layer.clone()
+            if profiler is not None:
+                layer.instrument(profiler)
+                function = layer.__anim_function__
+                names[order] = f"{order} {getattr(function, '__name__', '?')}"
+            start, layer.__after__ = layer.__after__, 0
+            if start > 0:
+                heappush(waiting, (start, order, layer))
+            else:
+                active.append((order, layer))
+        # the layers that start now start together (their workers, if
+        # they have some)
+        for _, layer in active:
+            layer.prepare()
+        index = 0
+        while active or waiting:
+            while waiting and waiting[0][0] <= index:
+                _, order, layer = heappop(waiting)
+                insort(active, (order, layer))
+            if not active:
+                # no layer draws anything until the next one starts
+                ticks = waiting[0][0] - index
+                index += ticks
+                yield Idle(ticks)
+                continue
+            step = []
+            removed = False
+            for position, (order, layer) in enumerate(active):
+                if profiler is not None:
+                    start_time = perf_counter()
+                try:
+                    modifications = next(layer)
+                except StopIteration:
+                    active[position] = None
+                    removed = True
+                    modifications = ()
+                if profiler is not None:
+                    profiler.record_layer(names[order],
+                                          perf_counter() - start_time)
+                if type(modifications) is Idle and modifications.ticks > 1:
+                    # the layer is not asked for any step until it draws again
+                    heappush(waiting, (index + modifications.ticks, order,
+                                       layer))
+                    active[position] = None
+                    removed = True
+                else:
+                    step.extend(modifications)
+            if removed:
+                active = [item for item in active if item is not None]
+                if not active:
+                    if not waiting:
+                        return
+                    # no layer draws anything until the next one wakes up
+                    ticks = waiting[0][0] - index
+                    index += ticks
+                    yield Idle(ticks)
+                    continue
+            index += 1
+            if self.culling and len(step) > 1:
+                step = cull_hidden(step)
+            yield step
+
+
+
+class Sequence(Anim):
+    # the sequence that this one was compiled from (see *optimizer*), and
+    # for each segment, the (tick, index) of the segments of *source* it is
+    # made of : the segment *index* of *source* starts *tick* ticks after
+    # the start of the segment
+    source = None
+    owners = ()
+
+    def __init__(self, frame, segments: list, after: int = 0) -> None:
+        """Initialize the object.
+        A sequence plays its segments one by one. The segments are kept in one
+        flat list, so the cost of a step does not depend on the number of
+        segments.
+        Args:
+            segments (list[Anim]): The animations to play, in order.
+            after (int): The delay before the animation starts.
+        """
+        self.segments = list(segments)
+        super().__init__(frame, self.__sequenced_animation__, after)
+
+    def restart(self) -> None:
+        """Restart the sequence from its first segment."""
+        super().restart()
+        # index of the segment that is being played
+        self.segment_index = 0
+
+    def clone(self):
+        """Return a copy of the sequence, that starts from its beginning."""
+        return Sequence(self.frame, self.segments, self.__delay__)
+
+    def delayed(self, delay: int):
+        """Return a copy of the sequence, delayed by *delay* more steps."""
+        if delay == 0:
+            return self
+        return Sequence(self.frame, self.segments, self.__delay__ + delay)
+
+    def __as_segments__(self) -> list:
+        """Return the segments of the sequence, so that concatenating it again
+        only extends the list of segments.
+        A delayed sequence is kept as one segment.
+        """
+        if self.__delay__ > 0:
+            return [self]
+        return list(self.segments)
+
+    def __iand__(self, other):
+        """The &= operator extends the sequence in place with *other*.
+        Args:
+            other (Anim): The animation to add after the current ones.
+        Returns:
+            Sequence: The sequence itself.
+        """
+        if isinstance(other, Sequence):
+            self.segments.extend(other.__as_segments__())
+        elif isinstance(other, Anim):
+            self.segments.append(other)
+        else:
+            self.segments.append(Anim(self.frame, other))
+        return self
+
+    def __sequenced_animation__(self, frame):
+        """Play the segments one by one.
+        Each segment is cloned when it starts, so the same animation can be
+        used several times in a sequence, and only one segment is alive at
+        a time.
+        """
+        self.segment_index = 0
+        # the length is read again after each segment, so that segments added
+        # with &= while playing are also played
+        while self.segment_index < len(self.segments):
+            self.__report_index__()
+            segment = self.segments[self.segment_index].clone()
+            if self.profiler is not None:
+                segment.instrument(self.profiler)
+            if self.source is None:
+                for step in segment:
+                    yield step
+            else:
+                yield from self.__follow_owners__(segment)
+            self.segment_index += 1
+        self.__report_index__()
+
+    def __report_index__(self) -> None:
+        """Give the index of the segment being played to the sequence that
+        this one was compiled from, as if it was playing itself."""
+        if self.source is None:
+            return
+        if self.segment_index < len(self.owners):
+            self.source.segment_index = self.owners[self.segment_index][0][1]
+        else:
+            self.source.segment_index = len(self.source.segments)
 
+    def __follow_owners__(self, segment):
+        """Play *segment*, and give to the source sequence the index of the
+        segment that each step comes from, when it is made of several of
+        them."""
+        owners = self.owners[self.segment_index]
+        if len(owners) == 1:
+            yield from segment
+            return
+        ticks = 0
+        following = 1
+        for step in segment:
+            while following < len(owners) and owners[following][0] <= ticks:
+                self.source.segment_index = owners[following][1]
+                following += 1
+            yield step
+            ticks += getattr(step, "ticks", 1)
@@ -0,0 +1,161 @@
+"""
+Module to play animations with asyncio.
+Each animation runs as its own task, on its own clock, and only writes to the
+frame buffer. Another task refreshes the screen, and another one reads the
+keys without blocking. So a slow step of one animation (for example one that
+waits for data) does not freeze the screen or the other animations.
+Animation functions can be async generator functions, given as they are or
+in an *Anim*, but not composed or concatenated with other animations (that
+are played synchronously).
+"""
+import asyncio
+from inspect import isasyncgenfunction
+
+from animations import Anim
+from anim_player import FRAME_DELAY
+
+# delay between two checks of the keyboard, in seconds
+KEY_POLL_DELAY = 0.01
+
+
+async def run_animation(frame, animation, fps: float = 1 / FRAME_DELAY) -> int:
+    """Apply the steps of an animation to the frame buffer, on its own clock.
+    The screen is not refreshed, see *render*.
+    Args:
+        frame (Frame): The frame to draw on.
+        animation (Anim or function): The animation, its animation function
+                                      can be an async generator function
+                                      (but not the function of one of the
+                                      animations it is made of).
+        fps (float): The number of steps per second of this animation.
+    Returns:
+        int: The number of steps played.
+    """
+    loop = asyncio.get_running_loop()
+    period = 1 / fps
+    deadline = loop.time()
+    steps = 0
+
+    async def wait(ticks: int = 1):
+        nonlocal deadline
+        deadline += period * ticks
+        # always give the other tasks a chance to run, even when late
+        await asyncio.sleep(max(deadline - loop.time(), 0))
+
+    if isinstance(animation, Anim):
+        function, delay = animation.__anim_function__, animation.__delay__
+    else:
+        function, delay = animation, 0
+    if isasyncgenfunction(function):
+        if delay:
+            # the delay is one idle step, like for the other animations
+            steps += 1
+            await wait(delay)
+        async for modif_list in function(frame):
+            frame.apply(modif_list if isinstance(modif_list, list)
+                        else [modif_list])
+            steps += 1
+            # an Idle step is one sleep for its whole duration
+            await wait(getattr(modif_list, "ticks", 1))
+        return steps
+    for modif_list in Anim(frame, animation):
+        frame.apply(modif_list)
+        steps += 1
+        await wait(getattr(modif_list, "ticks", 1))
+    return steps
+
+
+async def render(frame, fps: float = 1 / FRAME_DELAY) -> None:
+    """Refresh the screen *fps* times per second, until cancelled."""
+    loop = asyncio.get_running_loop()
+    period = 1 / fps
+    deadline = loop.time()
+    while True:
+        frame.poll_resize()
+        frame.refresh()
+        deadline += period
+        delay = deadline - loop.time()
+        if delay < 0:
+            # too late : skip the missed refreshes instead of drifting
+            deadline = loop.time()
+            delay = 0
+        await asyncio.sleep(delay)
+
+
+async def read_keys(frame, on_key) -> None:
+    """Call *on_key* with each key pressed, until cancelled.
+    The keyboard is read without blocking, so the other tasks keep running.
+    """
+    while True:
+        key = frame.getkey(block=False)
+        if key is None:
+            await asyncio.sleep(KEY_POLL_DELAY)
+        else:
+            on_key(key)
+
+
+async def play_async(frame, *animations, fps: float = 1 / FRAME_DELAY,
+                     on_key=None, quit_keys=("q",), pause: bool = True):
+    """Play animations at the same time, each one as an asyncio task.
+    Args:
+        frame (Frame): The frame to play the animations on.
+        animations: The animations. Each one is an Anim, an animation function
+                    (possibly an async generator function), or a tuple
+                    (animation, fps) to play it on its own clock.
+        fps (float): The number of refreshes of the screen per second, and the
+                     number of steps per second of the animations that do not
+                     give their own.
+        on_key (function): Called with the name of each key pressed.
+        quit_keys (tuple[str]): The keys that stop all the animations.
+        pause (bool): Wait for a key once all the animations are finished.
+    Returns:
+        list[int]: The number of steps played by each animation (None for the
+                   ones that were stopped by a quit key).
+    """
+    quit_event = asyncio.Event()
+
+    def handle_key(key):
+        if key in quit_keys:
+            quit_event.set()
+        if on_key is not None:
+            on_key(key)
+
+    tasks = []
+    for animation in animations:
+        if isinstance(animation, tuple):
+            animation, animation_fps = animation
+        else:
+            animation_fps = fps
+        tasks.append(asyncio.create_task(
+            run_animation(frame, animation, animation_fps)))
+    renderer = asyncio.create_task(render(frame, fps))
+    reader = asyncio.create_task(read_keys(frame, handle_key))
+    quitter = asyncio.create_task(quit_event.wait())
+    try:
+        pending = set(tasks)
+        while pending and not quit_event.is_set():
+            done, pending = await asyncio.wait(
+                pending | {quitter}, return_when=asyncio.FIRST_COMPLETED)
+            pending.discard(quitter)
+            for task in done:
+                if task is not quitter and task.exception() is not None:
+                    raise task.exception()
+        frame.refresh()
+        # nobody can press a key on a frame that is not shown
+        if pause and frame.realtime and not quit_event.is_set():
+            # wait for any key
+            pressed = asyncio.Event()
+            reader.cancel()
+            reader = asyncio.create_task(
+                read_keys(frame, lambda key: pressed.set()))
+            await pressed.wait()
+    finally:
+        for task in (*tasks, renderer, reader, quitter):
+            task.cancel()
+    return [task.result() if task.done() and not task.cancelled() else None
+            for task in tasks]
+
+
+def play_concurrently(frame, *animations, **kwargs):
+    """Synchronous version of *play_async*, that runs its own event loop."""
+    return asyncio.run(play_async(frame, *animations, **kwargs))
@@ -0,0 +1,177 @@
+"""
+Benchmarks of the animation engine.
+They are played on a *HeadlessFrame*, so they do not need a terminal.
+
+Usage:
+    python benchmarks.py                    # print the results
+    python benchmarks.py --json out.json    # also save them as JSON
+"""
+import argparse
+import json
+import platform
+import sys
+from time import perf_counter
+
+from frame import HeadlessFrame
+from animations import Anim
+from primitives import fadein, text, repeat, slow, color_ramp, move
+from grid import life, random_cells, np
+
+
+def run_steps(anim, max_steps: int = None) -> tuple[int, float]:
+    """Compute the steps of *anim*, without applying them. An idle step
+    counts for as many steps as it lasts.
+    Returns:
+        tuple[int, float]: The number of steps and the time it took.
+    """
+    steps = 0
+    start = perf_counter()
+    for modif_list in anim:
+        steps += getattr(modif_list, "ticks", 1)
+        if max_steps is not None and steps >= max_steps:
+            break
+    return steps, perf_counter() - start
+
+
+def composed_fadeins(frame, layers: int):
+    anim = Anim(frame, fadein(0, 0, "layer 0"))
+    for i in range(1, layers):
+        anim = anim >> Anim(frame, fadein(i % 24, i % 60, f"layer {i}"))
+    return anim
+
+
+def concatenated_texts(frame, segments: int):
+    anim = Anim(frame, text(0, 0, "slide 0", 250))
+    for i in range(1, segments):
+        anim = anim & Anim(frame, text(i % 24, 0, f"slide {i}", 250))
+    return anim
+
+
+def bench_compose(frame, layers: int):
+    return run_steps(composed_fadeins(frame, layers))
+
+
+def bench_concatenate(frame, segments: int):
+    return run_steps(concatenated_texts(frame, segments))
+
+
+def bench_repeat(frame, steps: int):
+    return run_steps(Anim(frame, repeat(fadein(0, 0, "repeat"))), steps)
+
+
+def bench_slow(frame, factor: int):
+    return run_steps(Anim(frame, slow(fadein(0, 0, "slow"), factor)))
+
+
+def bench_motion(frame, labels: int):
+    """Move *labels* texts at the same time, applying each step. An idle
+    step counts for as many steps as it lasts, and is not refreshed, like
+    the player does."""
+    anim = Anim(frame, move(0, 0, 23, 70, "label 0", 100))
+    for i in range(1, labels):
+        anim = anim >> Anim(frame, move(i % 24, i % 10, (i * 7) % 24, 70,
+                                        f"label {i}", 100, "in_out"))
+    start = perf_counter()
+    steps = 0
+    for modif_list in anim:
+        if modif_list:
+            frame.apply(modif_list)
+            frame.refresh()
+        steps += getattr(modif_list, "ticks", 1)
+    return steps, perf_counter() - start
+
+
+def bench_color_ramp(frame, length: int):
+    ramp = [232 + i % 24 for i in range(length)]
+    return run_steps(Anim(frame, color_ramp(0, 0, "ramp", ramp)))
+
+
+def bench_apply(frame, layers: int):
+    """Time only the application of the modifications to the frame."""
+    steps = list(composed_fadeins(frame, layers))
+    start = perf_counter()
+    for modif_list in steps:
+        frame.apply(modif_list)
+        frame.refresh()
+    return len(steps), perf_counter() - start
+
+
+def bench_grid(frame, steps: int):
+    """Play the Game of Life on a full 100 x 300 screen, applying each step
+    to the frame."""
+    frame = HeadlessFrame(100, 300)
+    anim = Anim(frame, life(0, 0, random_cells(100, 300, seed=0),
+                            steps=steps))
+    start = perf_counter()
+    for modif_list in anim:
+        frame.apply(modif_list)
+        frame.refresh()
+    return steps + 1, perf_counter() - start
+
+
+# (name, function, parameters)
+BENCHMARKS = [
+    ("compose", bench_compose, [10, 50, 200]),
+    ("concatenate", bench_concatenate, [100, 500, 2000]),
+    ("repeat", bench_repeat, [10000]),
+    ("slow", bench_slow, [2, 50, 1.5, 0.5]),
+    ("motion", bench_motion, [10, 100, 500]),
+    ("color_ramp", bench_color_ramp, [10000]),
+    ("apply", bench_apply, [10, 50, 200]),
+]
+if np is not None:
+    BENCHMARKS.append(("grid", bench_grid, [100]))
+
+
+def run_benchmarks(rounds: int = 3, names: list = None) -> list[dict]:
+    """Run the benchmarks, and keep the best time of *rounds* runs.
+    Args:
+        rounds (int): The number of runs of each benchmark.
+        names (list[str]): The benchmarks to run (all of them if None).
+    Returns:
+        list[dict]: One result per benchmark and parameter.
+    """
+    results = []
+    for name, function, parameters in BENCHMARKS:
+        if names and name not in names:
+            continue
+        for parameter in parameters:
+            best = None
+            for _ in range(rounds):
+                steps, seconds = function(HeadlessFrame(24, 80), parameter)
+                if best is None or seconds < best:
+                    best = seconds
+            results.append({
+                "name": name,
+                "parameter": parameter,
+                "steps": steps,
+                "seconds": best,
+                "steps_per_second": steps / best if best > 0 else None,
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--json", help="file to write the results to")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="number of runs of each benchmark (default 3)")
+    parser.add_argument("names", nargs="*",
+                        help="benchmarks to run (default all)")
+    args = parser.parse_args(argv)
+    results = run_benchmarks(args.rounds, args.names)
+    for result in results:
+        print(f"{result['name']:>12} {result['parameter']:>6} "
+              f"{result['steps']:>8} steps "
+              f"{result['steps_per_second'] or 0:>12.0f} steps/s")
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "results": results,
+            }, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
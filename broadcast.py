@@ -0,0 +1,223 @@
+"""
+Module to show an animation on several terminals at once.
+The animation is played once, on a frame that encodes the cells that changed
+at each step as ANSI escape sequences. The same encoded bytes are then sent
+to every viewer connected to the server (with TCP or a Unix socket), so each
+viewer only costs a write.
+A viewer that reads too slowly is not sent the next steps : once it caught up,
+it is sent a keyframe (the whole screen) instead, and gets the steps again.
+
+The server only listens on localhost. A viewer can be any program that copies
+the socket to the terminal, for example :
+    nc localhost 8765
+    socat UNIX-CONNECT:/tmp/animations.sock -
+"""
+import asyncio
+import ipaddress
+
+from animations import Anim
+from anim_player import FRAME_DELAY
+from export import AnsiFrame, CLEAR_SCREEN, RESET, encode_runs
+
+# bytes waiting to be sent to a viewer, above which it does not get the steps
+MAX_PENDING = 1 << 16
+
+
+def check_local(host: str) -> None:
+    """Raise a ValueError if *host* is not a loopback address."""
+    if host == "localhost":
+        return
+    try:
+        if ipaddress.ip_address(host).is_loopback:
+            return
+    except ValueError:
+        pass
+    raise ValueError(f"The server only listens on localhost, not on {host}")
+
+
+class BroadcastFrame(AnsiFrame):
+    """A frame that gives each refreshed step to a *BroadcastServer*, encoded
+    once as ANSI escape sequences."""
+
+    def __init__(self, server, height: int = 24, width: int = 80) -> None:
+        # the screen is cleared by the keyframe that each viewer gets first
+        self.server = None
+        super().__init__(None, height, width)
+        self.server = server
+
+    def output(self, data: str) -> None:
+        if self.server is not None:
+            self.server.publish(data.encode("utf-8"))
+
+    def keyframe(self) -> bytes:
+        """Return the encoding of the whole screen."""
+        return (CLEAR_SCREEN + encode_runs(self.buffer.get_runs(),
+                                           self.colors.pair_colors)
+                ).encode("utf-8")
+
+
+class BroadcastServer:
+    def __init__(self, height: int = 24, width: int = 80,
+                 host: str = "127.0.0.1", port: int = 0, path: str = None,
+                 max_pending: int = MAX_PENDING) -> None:
+        """Initialize the server. It listens once *start* is called.
+        Args:
+            height (int): The number of lines of the screen.
+            width (int): The number of columns of the screen.
+            host (str): The address to listen on (a loopback address).
+            port (int): The TCP port to listen on (0 for any free port).
+            path (str): The path of a Unix socket to listen on instead of a
+                        TCP port.
+            max_pending (int): The number of bytes waiting to be sent to a
+                               viewer above which it skips the steps.
+        Raises:
+            ValueError: If *host* is not a loopback address.
+        """
+        if path is None:
+            check_local(host)
+        self.host, self.port, self.path = host, port, path
+        self.max_pending = max_pending
+        self.frame = BroadcastFrame(self, height, width)
+        # writer of each viewer -> it needs a keyframe before the next step
+        self.viewers = {}
+        self.connected = asyncio.Condition()
+        self.server = None
+        # keyframe of the current step, encoded when a viewer needs it
+        self.__keyframe__ = None
+        # number of steps sent, of keyframes sent, of steps not sent to a
+        # slow viewer
+        self.steps = 0
+        self.keyframes = 0
+        self.skipped = 0
+
+    async def start(self) -> None:
+        """Start listening."""
+        if self.path is not None:
+            self.server = await asyncio.start_unix_server(self.__serve__,
+                                                          self.path)
+        else:
+            self.server = await asyncio.start_server(self.__serve__,
+                                                     self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+
+    async def __serve__(self, reader, writer) -> None:
+        """Handle a viewer until it disconnects."""
+        writer.write(self.keyframe())
+        self.viewers[writer] = False
+        async with self.connected:
+            self.connected.notify_all()
+        try:
+            # what the viewer types is ignored
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.viewers.pop(writer, None)
+            writer.close()
+
+    async def wait_viewers(self, count: int) -> None:
+        """Wait until at least *count* viewers are connected."""
+        async with self.connected:
+            await self.connected.wait_for(lambda: len(self.viewers) >= count)
+
+    def keyframe(self) -> bytes:
+        """Return the keyframe of the current step (encoded only once)."""
+        if self.__keyframe__ is None:
+            self.__keyframe__ = self.frame.keyframe()
+            self.keyframes += 1
+        return self.__keyframe__
+
+    def publish(self, data: bytes) -> None:
+        """Send the encoded changes of a step to the viewers."""
+        self.__keyframe__ = None
+        self.steps += 1
+        for writer, stale in list(self.viewers.items()):
+            transport = writer.transport
+            if transport.is_closing():
+                del self.viewers[writer]
+            elif transport.get_write_buffer_size() > self.max_pending:
+                # the viewer catches up with a keyframe later
+                self.viewers[writer] = True
+                self.skipped += 1
+            elif stale:
+                transport.write(self.keyframe())
+                self.viewers[writer] = False
+            else:
+                transport.write(data)
+
+    async def play(self, animation, fps: float = 1 / FRAME_DELAY) -> int:
+        """Play an animation in real time, and send it to the viewers.
+        Args:
+            animation (Anim or function): The animation.
+            fps (float): The number of steps per second.
+        Returns:
+            int: The number of steps played.
+        """
+        loop = asyncio.get_running_loop()
+        frame = self.frame
+        period = 1 / fps
+        deadline = loop.time()
+        steps = 0
+        for modif_list in Anim(frame, animation):
+            ticks = getattr(modif_list, "ticks", 1)
+            if modif_list:
+                frame.apply(modif_list)
+                frame.refresh()
+            else:
+                frame.idle(ticks)
+            steps += 1
+            deadline += period * ticks
+            await asyncio.sleep(max(deadline - loop.time(), 0))
+        return steps
+
+    async def close(self) -> None:
+        """Reset the style of the viewers, disconnect them and stop
+        listening. The viewers that skipped steps get the last screen first.
+        """
+        for writer, stale in list(self.viewers.items()):
+            if stale:
+                writer.write(self.keyframe())
+            writer.write(RESET.encode("utf-8"))
+            writer.close()
+        self.viewers.clear()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+async def broadcast_async(animation, host: str = "127.0.0.1", port: int = 0,
+                          path: str = None, height: int = 24,
+                          width: int = 80, fps: float = 1 / FRAME_DELAY,
+                          viewers: int = 1, on_start=None) -> BroadcastServer:
+    """Serve an animation to the viewers that connect to the server.
+    Args:
+        animation (Anim or function): The animation.
+        host (str): The address to listen on (a loopback address).
+        port (int): The TCP port to listen on (0 for any free port).
+        path (str): The path of a Unix socket to listen on instead.
+        height (int): The number of lines of the screen.
+        width (int): The number of columns of the screen.
+        fps (float): The number of steps per second.
+        viewers (int): The number of viewers to wait for before playing.
+        on_start (function): Called with the server once it listens (to know
+                             its port for example).
+    Returns:
+        BroadcastServer: The server, closed, with its statistics.
+    """
+    server = BroadcastServer(height, width, host, port, path)
+    await server.start()
+    try:
+        if on_start is not None:
+            on_start(server)
+        await server.wait_viewers(viewers)
+        await server.play(animation, fps)
+    finally:
+        await server.close()
+    return server
+
+
+def broadcast(animation, **kwargs) -> BroadcastServer:
+    """Synchronous version of *broadcast_async*, that runs its own event
+    loop."""
+    return asyncio.run(broadcast_async(animation, **kwargs))
@@ -0,0 +1,152 @@
+"""
+Module to manage the color pairs of curses.
+A terminal only has a limited number of color pairs, too few to define one
+for each (foreground, background) combination in advance. The pairs are
+defined the first time a combination is used instead, and when there is no
+free pair left, the least recently used one is defined again for the new
+combination.
+"""
+import curses
+from collections import OrderedDict
+
+# position of the color pair number in a curses attribute
+COLOR_SHIFT = (curses.A_COLOR & -curses.A_COLOR).bit_length() - 1
+# greatest pair number that fits in an attribute
+MAX_PAIR = curses.A_COLOR >> COLOR_SHIFT
+# color number of the default foreground or background of the terminal
+DEFAULT_COLOR = -1
+
+
+def to_color(col):
+    """Return *col* as the frames take it : None for no color, a color number,
+    or a tuple (foreground, background)."""
+    if col is None:
+        return None
+    if isinstance(col, (tuple, list)):
+        fg, bg = col
+        return int(fg), int(bg)
+    return int(col)
+
+
+def split_color(attr: int) -> tuple[int, int]:
+    """Split a curses attribute in the attribute without its color pair, and
+    the color of the pair (None if it has no pair). A raw pair number *n*
+    (from curses.color_pair(n)) is read as the color *n*, since the pairs of
+    the frames are defined by their *ColorManager*.
+    """
+    pair = (attr & curses.A_COLOR) >> COLOR_SHIFT
+    if not pair:
+        return attr, None
+    return attr & ~curses.A_COLOR, pair
+
+
+class ColorManager:
+    def __init__(self, max_pairs: int = None, init_pair=curses.init_pair,
+                 in_use=None) -> None:
+        """Initialize the manager.
+        Args:
+            max_pairs (int): The number of color pairs of the terminal, pair 0
+                             (the default colors) included. Defaults to
+                             curses.COLOR_PAIRS, that is known once
+                             curses.start_color was called.
+            init_pair (function): The function that defines a pair from its
+                                  number and its colors (curses.init_pair by
+                                  default), or None if there is no terminal.
+            in_use (function): The function that returns the pair numbers
+                               still shown on the screen, that are not
+                               evicted while another pair can be.
+        """
+        if max_pairs is None:
+            max_pairs = getattr(curses, "COLOR_PAIRS", MAX_PAIR + 1)
+        self.max_pairs = min(int(max_pairs), MAX_PAIR + 1)
+        self.init_pair = init_pair
+        self.in_use = in_use
+        # color, as it is given -> attribute
+        self.cache = {}
+        # (fg, bg) -> attribute
+        self.pairs = {}
+        # attribute -> (fg, bg), from the least to the most recently used
+        self.lru = OrderedDict()
+        # pair number -> (fg, bg), for the pairs that are defined
+        self.pair_colors = {}
+        # all the pairs are defined : the next color evicts one of them
+        self.full = self.max_pairs < 2
+        # number of pairs defined again for another combination
+        self.evictions = 0
+
+    def attr(self, col) -> int:
+        """Return the attribute that shows text with the color *col*.
+        Args:
+            col (int or tuple[int, int]): The foreground color, or a tuple
+                                          (foreground, background). -1 is the
+                                          default color of the terminal.
+        Returns:
+            int: The attribute of the color pair.
+        """
+        try:
+            attr = self.cache[col]
+        except (KeyError, TypeError):
+            return self.__allocate__(col)
+        # the order of use only matters once a pair has to be evicted
+        if self.full:
+            self.lru.move_to_end(attr)
+        return attr
+
+    def __allocate__(self, col) -> int:
+        """Return the attribute of a color that is not in the cache, after
+        defining its pair if needed."""
+        if isinstance(col, (tuple, list)):
+            fg, bg = col
+        else:
+            fg, bg = col, DEFAULT_COLOR
+        key = (int(fg), int(bg))
+        if key == (DEFAULT_COLOR, DEFAULT_COLOR) or self.max_pairs < 2:
+            # pair 0 is always the default colors, and can not be defined
+            return 0
+        attr = self.pairs.get(key)
+        if attr is not None:
+            self.lru.move_to_end(attr)
+        else:
+            if not self.full:
+                pair = len(self.pairs) + 1
+            else:
+                attr = self.__victim__()
+                del self.pairs[self.lru.pop(attr)]
+                self.cache = {color: value
+                              for color, value in self.cache.items()
+                              if value != attr}
+                pair = attr >> COLOR_SHIFT
+                self.evictions += 1
+            if self.init_pair is not None:
+                self.init_pair(pair, *key)
+            self.pair_colors[pair] = key
+            attr = pair << COLOR_SHIFT
+            self.pairs[key] = attr
+            self.lru[attr] = key
+            self.full = len(self.pairs) >= self.max_pairs - 1
+        try:
+            self.cache[col] = attr
+        except TypeError:
+            # a list can not be a key
+            pass
+        return attr
+
+    def __victim__(self) -> int:
+        """Return the attribute of the pair to define again : the least
+        recently used one that is not shown, or the least recently used one
+        if they are all shown (the text shown with it then changes color)."""
+        if self.in_use is not None:
+            shown = self.in_use()
+            for attr in self.lru:
+                if attr >> COLOR_SHIFT not in shown:
+                    return attr
+        return next(iter(self.lru))
+
+    def colors_of(self, attr: int) -> tuple[int, int]:
+        """Return the (fg, bg) colors of the pair of the attribute *attr*.
+        A pair that the manager did not define (a raw curses.color_pair(n))
+        is read as the color *n*, like *split_color* does."""
+        pair = (attr & curses.A_COLOR) >> COLOR_SHIFT
+        if not pair:
+            return DEFAULT_COLOR, DEFAULT_COLOR
+        return self.pair_colors.get(pair, (pair, DEFAULT_COLOR))
@@ -0,0 +1,168 @@
+"""
+Module to export animations to files, as raw ANSI escape sequences or as
+asciicast v2 recordings (https://docs.asciinema.org/manual/asciicast/v2/).
+The animation is played on a frame that encodes each step and writes it to
+the file straight away, so the memory used does not depend on the length of
+the animation.
+"""
+import curses
+import json
+
+from frame import HeadlessFrame
+from colors import COLOR_SHIFT, DEFAULT_COLOR
+from anim_player import play, FRAME_DELAY
+
+CSI = "\x1b["
+CLEAR_SCREEN = CSI + "2J" + CSI + "H"
+RESET = CSI + "0m"
+
+# curses attribute -> SGR parameter
+ATTRIBUTE_CODES = [
+    (curses.A_BOLD, "1"),
+    (curses.A_DIM, "2"),
+    (getattr(curses, "A_ITALIC", 0), "3"),
+    (curses.A_UNDERLINE, "4"),
+    (curses.A_BLINK, "5"),
+    (curses.A_REVERSE, "7"),
+    (curses.A_INVIS, "8"),
+]
+
+
+def sgr(attr: int, pair_colors: dict = None) -> str:
+    """Return the escape sequence that sets the curses attribute *attr*.
+    Args:
+        attr (int): The curses attribute.
+        pair_colors (dict[int, tuple[int, int]]): The (fg, bg) colors of each
+            color pair (like *ColorManager.pair_colors*). If it is None, or
+            if the pair is not in it, the color pair *n* is shown with the
+            color *n* of the 256 colors palette.
+    Returns:
+        str: The escape sequence.
+    """
+    codes = ["0"]
+    for flag, code in ATTRIBUTE_CODES:
+        if flag and attr & flag:
+            codes.append(code)
+    pair = (attr & curses.A_COLOR) >> COLOR_SHIFT
+    if pair:
+        if pair_colors is None:
+            fg, bg = pair, DEFAULT_COLOR
+        else:
+            fg, bg = pair_colors.get(pair, (pair, DEFAULT_COLOR))
+        if fg != DEFAULT_COLOR:
+            codes.append(f"38;5;{fg}")
+        if bg != DEFAULT_COLOR:
+            codes.append(f"48;5;{bg}")
+    return CSI + ";".join(codes) + "m"
+
+
+def encode_runs(runs: list[tuple[int, int, str, int]],
+                pair_colors: dict = None) -> str:
+    """Encode (y, x, string, attr) runs of cells as ANSI escape sequences.
+    *pair_colors* gives the colors of the pairs, see *sgr*."""
+    parts = []
+    current_attr = None
+    for y, x, string, attr in runs:
+        parts.append(f"{CSI}{y + 1};{x + 1}H")
+        if attr != current_attr:
+            parts.append(sgr(attr, pair_colors))
+            current_attr = attr
+        parts.append(string)
+    if current_attr is not None:
+        parts.append(RESET)
+    return "".join(parts)
+
+
+class AnsiFrame(HeadlessFrame):
+    """A frame that writes each refreshed step to a file, as ANSI escape
+    sequences."""
+
+    def __init__(self, file, height: int = 24, width: int = 80,
+                 only_changes: bool = True) -> None:
+        """Initialize the frame.
+        Args:
+            file: The text file to write to.
+            height (int): The number of lines.
+            width (int): The number of columns.
+            only_changes (bool): Only write the cells that changed since the
+                                 previous step, instead of the whole screen.
+        """
+        super().__init__(height, width)
+        self.file = file
+        self.only_changes = only_changes
+        # number of steps played so far, refreshed or idle
+        self.tick = 0
+        self.output(CLEAR_SCREEN)
+
+    def output(self, data: str) -> None:
+        """Write the encoded *data* of a step."""
+        self.file.write(data)
+
+    def refresh(self):
+        if self.only_changes:
+            data = encode_runs(self.buffer.changes(),
+                               self.colors.pair_colors)
+        else:
+            self.buffer.sync()
+            data = CSI + "H" + encode_runs(self.buffer.get_runs(),
+                                           self.colors.pair_colors)
+        if data:
+            self.output(data)
+        self.refresh_count += 1
+        self.tick += 1
+
+    def idle(self, ticks: int) -> None:
+        self.tick += ticks
+
+
+class AsciicastFrame(AnsiFrame):
+    """A frame that writes each refreshed step to a file, as an event of an
+    asciicast v2 recording."""
+
+    def __init__(self, file, height: int = 24, width: int = 80,
+                 only_changes: bool = True,
+                 frame_delay: float = FRAME_DELAY) -> None:
+        """Initialize the frame.
+        Args:
+            frame_delay (float): The duration of a step, in seconds.
+        """
+        self.frame_delay = frame_delay
+        file.write(json.dumps({"version": 2, "width": width,
+                               "height": height}) + "\n")
+        super().__init__(file, height, width, only_changes)
+
+    def output(self, data: str) -> None:
+        """Write the encoded *data* of a step, as an output event."""
+        time = round(self.tick * self.frame_delay, 6)
+        self.file.write(json.dumps([time, "o", data]) + "\n")
+
+
+def export(animation, path: str, format: str = "asciicast",
+           height: int = 24, width: int = 80, only_changes: bool = True,
+           frame_delay: float = FRAME_DELAY):
+    """Export an animation to a file.
+    Args:
+        animation (Anim or function): The animation to export.
+        path (str): The path of the file.
+        format (str): "asciicast" for an asciicast v2 file, or "ansi" for a
+                      raw stream of ANSI escape sequences.
+        height (int): The number of lines of the screen.
+        width (int): The number of columns of the screen.
+        only_changes (bool): Only write the cells that changed at each step.
+        frame_delay (float): The duration of a step, in seconds (asciicast).
+    Returns:
+        PlaybackStats: The statistics of the run.
+    Raises:
+        ValueError: If *format* is not known.
+    """
+    if format not in ("asciicast", "ansi"):
+        raise ValueError(f"Unknown export format : {format}")
+    with open(path, "w", encoding="utf-8", buffering=1 << 16) as file:
+        if format == "asciicast":
+            frame = AsciicastFrame(file, height, width, only_changes,
+                                   frame_delay)
+        else:
+            frame = AnsiFrame(file, height, width, only_changes)
+        stats = play(frame, animation)
+        frame.output(RESET)
+    return stats
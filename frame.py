@@ -1,45 +1,592 @@
 import curses
-from typing import TypeVar
+import os
+import signal
+import sys
+import weakref
+from array import array
+from collections import deque
+from typing import NamedTuple, TypeVar
+
+from colors import ColorManager, COLOR_SHIFT, MAX_PAIR, split_color
 
 # Type to represent a frame modification
 # That is a method of *Frame* that modifies the frame
 FrameModification = TypeVar('FrameModification')
 
 
+class DrawOp(NamedTuple):
+    """A frame modification stored as plain data : write *string* at (y, x)
+    with the attribute *attr*, and the color *col* if it is not None.
+    It is cheaper to create and to apply than a function of the frame, and it
+    can still be called like one.
+    """
+    y: int
+    x: int
+    string: str
+    attr: int = 0
+    col: int = None
+
+    def __call__(self, frame) -> None:
+        frame.draw(self)
+
+
+class DrawBatch:
+    """Many writes stored as a structure of arrays, applied at once with
+    *Frame.draw_batch*. Like *DrawOp*, it can be called like a frame
+    modification.
+    """
+    __slots__ = ("ys", "xs", "strings", "attrs", "cols")
+
+    def __init__(self, ys=None, xs=None, strings=None, attrs=None,
+                 cols=None) -> None:
+        """Initialize the batch.
+        Args:
+            ys (sequence[int]): The lines of the writes.
+            xs (sequence[int]): The columns of the writes.
+            strings (sequence[str]): The texts of the writes.
+            attrs (sequence[int]): The attributes of the writes.
+            cols (sequence[int]): The colors of the writes (None for a write
+                                  with no color), or None if no write has a
+                                  color.
+        """
+        self.ys = array('i') if ys is None else ys
+        self.xs = array('i') if xs is None else xs
+        self.strings = [] if strings is None else strings
+        self.attrs = [] if attrs is None else attrs
+        self.cols = cols
+
+    def append(self, y: int, x: int, string: str, attr: int = 0,
+               col: int = None) -> None:
+        """Add a write at the end of the batch."""
+        if col is not None and self.cols is None:
+            self.cols = [None] * len(self.strings)
+        self.ys.append(y)
+        self.xs.append(x)
+        self.strings.append(string)
+        self.attrs.append(attr)
+        if self.cols is not None:
+            self.cols.append(col)
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def __call__(self, frame) -> None:
+        frame.draw_batch(self)
+
+
+class ScreenBuffer:
+    """A grid of characters and attributes that mirrors the screen.
+    Writes go to the back buffer. The front buffer holds what has already been
+    sent to the screen, so that only the cells that changed have to be sent
+    again.
+    """
+
+    def __init__(self, height: int, width: int) -> None:
+        """Initialize a blank buffer.
+        Args:
+            height (int): The number of lines.
+            width (int): The number of columns.
+        """
+        self.height = int(height)
+        self.width = int(width)
+        # back buffer : what the screen should look like
+        self.chars = [[' '] * self.width for _ in range(self.height)]
+        self.attrs = [array('Q', bytes(8 * self.width))
+                      for _ in range(self.height)]
+        # front buffer : what the screen looks like
+        self.__front_chars__ = [row[:] for row in self.chars]
+        self.__front_attrs__ = [row[:] for row in self.attrs]
+        # line -> (start, stop) columns written since the last flush
+        self.__dirty__ = {}
+
+    def __mark_dirty__(self, y: int, start: int, stop: int) -> None:
+        if y in self.__dirty__:
+            old_start, old_stop = self.__dirty__[y]
+            self.__dirty__[y] = (min(start, old_start), max(stop, old_stop))
+        else:
+            self.__dirty__[y] = (start, stop)
+
+    def write(self, y: int, x: int, string: str, attr: int = 0) -> None:
+        """Write *string* at the given coordinates, with the *attr* attribute.
+        The part of the string that is outside of the buffer is clipped.
+        Each line of a string with newlines is written at the column *x*, one
+        under the other (a cell never holds a newline, that the terminal
+        would not show as one cell).
+        Example:
+            >>> buffer = ScreenBuffer(3, 6)
+            >>> buffer.write(0, 2, "ab\\ncd")
+            >>> [buffer.get_line(y) for y in range(buffer.height)]
+            ['  ab  ', '  cd  ', '      ']
+        """
+        if "\n" in string:
+            for dy, line in enumerate(string.split("\n")):
+                self.write(y + dy, x, line, attr)
+            return
+        if y < 0 or y >= self.height:
+            return
+        if x < 0:
+            string = string[-x:]
+            x = 0
+        stop = min(x + len(string), self.width)
+        if stop <= x:
+            return
+        self.chars[y][x:stop] = string[:stop - x]
+        self.attrs[y][x:stop] = array('Q', (attr,)) * (stop - x)
+        self.__mark_dirty__(y, x, stop)
+
+    def clear(self) -> None:
+        """Blank the whole back buffer."""
+        for y in range(self.height):
+            self.chars[y][:] = [' '] * self.width
+            self.attrs[y][:] = array('Q', bytes(8 * self.width))
+            self.__mark_dirty__(y, 0, self.width)
+
+    def changes(self) -> list[tuple[int, int, str, int]]:
+        """Get the cells that changed since the last call, and consider them
+        as sent to the screen.
+        Adjacent changed cells that share the same attribute are merged.
+        Returns:
+            list[tuple[int, int, str, int]]: (y, x, string, attr) runs.
+        Example:
+            >>> buffer = ScreenBuffer(2, 10)
+            >>> buffer.write(0, 1, "hello")
+            >>> buffer.write(0, 3, "LL", 1)
+            >>> buffer.write(1, 8, "abcd")  # clipped to the width
+            >>> buffer.changes()
+            [(0, 1, 'he', 0), (0, 3, 'LL', 1), (0, 5, 'o', 0), (1, 8, 'ab', 0)]
+            >>> # the cells written again with the same content did not change
+            >>> buffer.write(0, 0, " heLLo", 0)
+            >>> buffer.changes()
+            [(0, 3, 'LL', 0)]
+            >>> buffer.changes()
+            []
+        """
+        runs = []
+        for y, (start, stop) in sorted(self.__dirty__.items()):
+            chars, attrs = self.chars[y], self.attrs[y]
+            front_chars = self.__front_chars__[y]
+            front_attrs = self.__front_attrs__[y]
+            x = start
+            while x < stop:
+                if chars[x] == front_chars[x] and attrs[x] == front_attrs[x]:
+                    x += 1
+                    continue
+                run_start, attr = x, attrs[x]
+                x += 1
+                while (x < stop and attrs[x] == attr
+                       and (chars[x] != front_chars[x]
+                            or attr != front_attrs[x])):
+                    x += 1
+                runs.append((y, run_start, ''.join(chars[run_start:x]), attr))
+            front_chars[start:stop] = chars[start:stop]
+            front_attrs[start:stop] = attrs[start:stop]
+        self.__dirty__.clear()
+        return runs
+
+    def sync(self) -> None:
+        """Consider the back buffer as sent to the screen, without computing
+        what changed."""
+        for y, (start, stop) in self.__dirty__.items():
+            self.__front_chars__[y][start:stop] = self.chars[y][start:stop]
+            self.__front_attrs__[y][start:stop] = self.attrs[y][start:stop]
+        self.__dirty__.clear()
+
+    def snapshot(self) -> tuple[list, list]:
+        """Return a copy of the back buffer, that can be given to *restore*."""
+        return ([row[:] for row in self.chars],
+                [row[:] for row in self.attrs])
+
+    def restore(self, snapshot: tuple[list, list]) -> None:
+        """Set the back buffer to a copy made by *snapshot*. Only the cells
+        that differ from the screen are sent on the next refresh.
+        The snapshot is clipped (or completed with blank cells) if the
+        buffer was resized since it was made."""
+        chars, attrs = snapshot
+        width = self.width
+        for y in range(self.height):
+            if y < len(chars):
+                row_chars, row_attrs = chars[y][:width], attrs[y][:width]
+            else:
+                row_chars, row_attrs = [], array('Q')
+            missing = width - len(row_chars)
+            if missing > 0:
+                row_chars = row_chars + [' '] * missing
+                row_attrs = row_attrs + array('Q', bytes(8 * missing))
+            self.chars[y][:] = row_chars
+            self.attrs[y][:] = row_attrs
+            self.__mark_dirty__(y, 0, width)
+
+    def resize(self, height: int, width: int) -> None:
+        """Change the size of the buffer, keeping what fits in the new size.
+        The cells that the resize exposes are blank, and they are sent to the
+        screen on the next refresh (the terminal may show anything there),
+        while the cells that were kept are only sent if they change.
+        Args:
+            height (int): The new number of lines.
+            width (int): The new number of columns.
+        Example:
+            >>> buffer = ScreenBuffer(2, 4)
+            >>> buffer.write(0, 0, "abcd")
+            >>> buffer.write(1, 0, "efgh")
+            >>> buffer.sync()
+            >>> buffer.write(0, 0, "A")
+            >>> buffer.resize(3, 3)
+            >>> [buffer.get_line(y) for y in range(buffer.height)]
+            ['Abc', 'efg', '   ']
+            >>> # the write that was not flushed, and the exposed line
+            >>> buffer.changes()
+            [(0, 0, 'A', 0), (2, 0, '   ', 0)]
+            >>> buffer.resize(3, 5)
+            >>> buffer.changes()
+            [(0, 3, '  ', 0), (1, 3, '  ', 0), (2, 3, '  ', 0)]
+        """
+        height, width = int(height), int(width)
+        old_width = self.width
+        front_chars, front_attrs = self.__front_chars__, self.__front_attrs__
+        # the lines that are not shown any more
+        for rows in (self.chars, self.attrs, front_chars, front_attrs):
+            del rows[height:]
+        for y in range(min(height, self.height)):
+            if width < old_width:
+                for row in (self.chars[y], self.attrs[y], front_chars[y],
+                            front_attrs[y]):
+                    del row[width:]
+            elif width > old_width:
+                missing = width - old_width
+                self.chars[y].extend([' '] * missing)
+                self.attrs[y].extend(array('Q', bytes(8 * missing)))
+                # a character that is never written, so the cells are sent
+                front_chars[y].extend(['\0'] * missing)
+                front_attrs[y].extend(array('Q', bytes(8 * missing)))
+                self.__mark_dirty__(y, old_width, width)
+        for y in range(self.height, height):
+            self.chars.append([' '] * width)
+            self.attrs.append(array('Q', bytes(8 * width)))
+            front_chars.append(['\0'] * width)
+            front_attrs.append(array('Q', bytes(8 * width)))
+            self.__mark_dirty__(y, 0, width)
+        # the writes that were not flushed, in what is left of the screen
+        dirty = {}
+        for y, (start, stop) in self.__dirty__.items():
+            if y < height and start < width:
+                dirty[y] = (start, min(stop, width))
+        self.__dirty__ = dirty
+        self.height, self.width = height, width
+
+    def get_runs(self) -> list[tuple[int, int, str, int]]:
+        """Get all the cells of the back buffer, as (y, x, string, attr) runs
+        of adjacent cells that share the same attribute."""
+        runs = []
+        for y in range(self.height):
+            chars, attrs = self.chars[y], self.attrs[y]
+            x = 0
+            while x < self.width:
+                run_start, attr = x, attrs[x]
+                x += 1
+                while x < self.width and attrs[x] == attr:
+                    x += 1
+                runs.append((y, run_start, ''.join(chars[run_start:x]), attr))
+        return runs
+
+    def get_line(self, y: int) -> str:
+        """Return the characters of the line *y* of the back buffer."""
+        return ''.join(self.chars[y])
+
+    def pairs_in_use(self) -> set[int]:
+        """Return the color pair numbers of the cells of the back buffer."""
+        attrs = set()
+        for row in self.attrs:
+            attrs.update(row)
+        return {(attr & curses.A_COLOR) >> COLOR_SHIFT for attr in attrs}
+
+
+# frames to notify when the terminal is resized
+__resize_watchers__ = weakref.WeakSet()
+
+
+def __on_resize__(signum, stack) -> None:
+    """Handler of SIGWINCH : only tell the frames, that resize themselves
+    before their next step (see *Frame.poll_resize*)."""
+    for frame in __resize_watchers__:
+        frame.resized = True
+
+
+def watch_resize(frame) -> None:
+    """Set *frame.resized* when the terminal is resized.
+    This replaces the SIGWINCH handler of curses for the whole process (the
+    handler of curses can not be installed again from Python), so curses does
+    not report KEY_RESIZE any more, and *Frame.poll_resize* resizes its window
+    instead. Signals can only be handled in the main thread : elsewhere, the
+    frame is only resized when getkey returns KEY_RESIZE.
+    """
+    if not hasattr(signal, "SIGWINCH"):
+        return
+    try:
+        signal.signal(signal.SIGWINCH, __on_resize__)
+    except ValueError:
+        return
+    __resize_watchers__.add(frame)
+
+
 class Frame:
-    def __init__(self, scr) -> None:
-        # scr is a curses stdscr
+    # the animations played on this frame are shown in real time
+    realtime = True
+
+    def __init__(self, scr, handle_resize: bool = False) -> None:
+        """Initialize the frame.
+        Args:
+            scr: The curses window to draw on (like stdscr).
+            handle_resize (bool): Handle SIGWINCH to know when the terminal
+                                  is resized (see *watch_resize*). Otherwise
+                                  curses keeps its handler, and
+                                  *poll_resize* asks the terminal for its
+                                  size.
+        """
         self.scr = scr
+        # (height, width) of the screen, updated by *resize*
+        self.size = scr.getmaxyx()
+        # modifications are written to this buffer, and only the cells that
+        # changed are sent to curses on refresh
+        self.buffer = ScreenBuffer(*self.size)
+        # set when the terminal is resized, see *poll_resize*
+        self.resized = False
+        if handle_resize:
+            watch_resize(self)
+        # position of the cursor after the last write, used by addstr calls
+        # that do not give coordinates
+        self.cursor = (0, 0)
+        # color pairs are defined when a color is first used
+        self.colors = ColorManager(in_use=self.buffer.pairs_in_use)
 
-    def put_text(self, y: int, x: int, text: str, col: int =None) -> None:
-        if col is None:
-            self.scr.addstr(int(y), int(x), str(text))
+    def __write__(self, y: int, x: int, text: str, attr: int = 0,
+                  col: int = None) -> None:
+        """Every write to the frame goes through this method."""
+        if col is not None:
+            attr |= self.color_attr(col)
+        self.buffer.write(y, x, text, attr)
+        if "\n" in text:
+            lines = text.split("\n")
+            self.cursor = (y + len(lines) - 1, x + len(lines[-1]))
         else:
-            self.scr.addstr(int(y), int(x), str(text), curses.color_pair(col))
+            self.cursor = (y, x + len(text))
+
+    def put_text(self, y: int, x: int, text: str, col: int =None) -> None:
+        self.__write__(int(y), int(x), str(text), 0, col)
+
+    def color_attr(self, col) -> int:
+        """Return the attribute that shows text with the color *col*, a color
+        number or a tuple (foreground, background)."""
+        return self.colors.attr(col)
 
     def addstr(self, *args, **kwargs):
-        """The original curses function."""
-        self.scr.addstr(*args, **kwargs)
+        """The original curses function.
+        Accepts the same forms as curses : (str), (str, attr), (y, x, str) and
+        (y, x, str, attr).
+        """
+        attr = kwargs.get("attr", 0)
+        if len(args) >= 3:
+            y, x, text = args[:3]
+            if len(args) > 3:
+                attr = args[3]
+        else:
+            y, x = self.cursor
+            text = args[0]
+            if len(args) > 1:
+                attr = args[1]
+        # the color pair of the attribute is a color for the color manager
+        attr, col = split_color(int(attr))
+        self.__write__(int(y), int(x), str(text), attr, col)
+
+    def draw(self, op: DrawOp) -> None:
+        """Apply a *DrawOp* to the frame."""
+        self.__write__(*op)
+
+    def draw_batch(self, batch: DrawBatch) -> None:
+        """Apply all the writes of a *DrawBatch* to the frame."""
+        write = self.__write__
+        if batch.cols is None:
+            for y, x, string, attr in zip(batch.ys, batch.xs, batch.strings,
+                                          batch.attrs):
+                write(y, x, string, attr)
+            return
+        for y, x, string, attr, col in zip(batch.ys, batch.xs, batch.strings,
+                                           batch.attrs, batch.cols):
+            write(y, x, string, attr, col)
+
+    def apply(self, modifications: list) -> None:
+        """Apply a list of modifications (draw ops, batches or functions of
+        the frame) to the frame, in order."""
+        for modif in modifications:
+            kind = type(modif)
+            if kind is DrawOp:
+                self.draw(modif)
+            elif kind is DrawBatch:
+                self.draw_batch(modif)
+            else:
+                modif(self)
 
     def refresh(self):
+        for y, x, string, attr in self.buffer.changes():
+            try:
+                self.scr.addstr(y, x, string, attr)
+            except curses.error:
+                # writing the bottom right cell moves the cursor out of the
+                # screen, which curses reports as an error after writing
+                pass
         self.scr.refresh()
 
     def clear(self):
-        self.scr.clear()
+        self.buffer.clear()
+
+    def idle(self, ticks: int) -> None:
+        """Called by the player when nothing is drawn for *ticks* steps, so
+        the frame is not refreshed."""
+        pass
 
     def getmaxyx(self):
         """Return a tuple (y, x) of the height and width of the frame."""
-        return self.scr.getmaxyx()
+        return self.size
+
+    def resize(self, height: int, width: int) -> bool:
+        """Change the size of the frame, keeping what is drawn on it. Only
+        the cells that the resize exposes are redrawn on the next refresh.
+        Returns:
+            bool: True if the size changed.
+        """
+        if (height, width) == self.size:
+            return False
+        self.size = (height, width)
+        self.buffer.resize(height, width)
+        return True
+
+    def poll_resize(self) -> bool:
+        """Resize the frame if the terminal was resized since the last call.
+        The players call it before each step, so the animations go on with
+        the new size.
+        Returns:
+            bool: True if the size changed.
+        """
+        if not self.resized:
+            if self.scr is None or self in __resize_watchers__:
+                return False
+            # SIGWINCH is left to curses, so ask the terminal for its size
+            # (a single system call)
+            try:
+                columns, lines = os.get_terminal_size(sys.__stdout__.fileno())
+                if not curses.is_term_resized(lines, columns):
+                    return False
+            except (AttributeError, OSError, ValueError, curses.error):
+                return False
+        self.resized = False
+        try:
+            columns, lines = os.get_terminal_size(sys.__stdout__.fileno())
+            curses.resizeterm(lines, columns)
+        except (OSError, ValueError, curses.error):
+            lines, columns = self.scr.getmaxyx()
+        return self.resize(lines, columns)
+
+    def pause(self):
+        # wait for a keypress
+        self.getkey(block=True)
+
+    def getkey(self, block: bool = True) -> str:
+        """Return the name of the next key pressed.
+        When the terminal is resized, the frame is resized and refreshed
+        before the key is returned (KEY_RESIZE if curses reports the resize).
+        Args:
+            block (bool): Wait for a key. If False, return None when no key
+                          was pressed.
+        """
+        self.scr.nodelay(not block)
+        while True:
+            try:
+                key = self.scr.getkey()
+            except curses.error:
+                # no key, or the wait was interrupted by a resize
+                interrupted = self.resized
+                if self.poll_resize():
+                    self.refresh()
+                if block and interrupted:
+                    continue
+                return None
+            if key == "KEY_RESIZE":
+                # curses resized its own window already
+                if self.resize(*self.scr.getmaxyx()):
+                    self.refresh()
+            return key
+
+
+    def copy(self):
+        frame = Frame(self.scr, self in __resize_watchers__)
+        # the pairs are the ones of the terminal, so they are shared
+        frame.colors = self.colors
+        return frame
+
+
+class HeadlessFrame(Frame):
+    """A frame that is only kept in memory, with no terminal.
+    It has the same interface as *Frame*, so animations can be played on it as
+    fast as possible (in tests, benchmarks or batch jobs), and what they draw
+    can be inspected in its buffer.
+    """
+    # the animations played on this frame are not shown, so there is no need
+    # to wait between the frames
+    realtime = False
+
+    def __init__(self, height: int = 24, width: int = 80) -> None:
+        """Initialize the frame.
+        Args:
+            height (int): The number of lines.
+            width (int): The number of columns.
+        """
+        self.scr = None
+        self.size = (height, width)
+        self.buffer = ScreenBuffer(height, width)
+        # a frame with no terminal is only resized by *resize*
+        self.resized = False
+        self.cursor = (0, 0)
+        # the pairs are numbered like on a terminal, but not defined
+        self.colors = ColorManager(MAX_PAIR + 1, init_pair=None,
+                                   in_use=self.buffer.pairs_in_use)
+        # number of calls to refresh
+        self.refresh_count = 0
+        # keys returned by getkey, see *feed_keys*
+        self.keys = deque()
+
+    def refresh(self):
+        self.buffer.sync()
+        self.refresh_count += 1
 
     def pause(self):
-        # wait for keypress on getkey
-        self.scr.nodelay(0)
-        # ask for a key
-        self.scr.getkey()
+        # there is no one to press a key
+        pass
+
+    def feed_keys(self, keys) -> None:
+        """Add keys (names like the ones of curses getkey) to be returned by
+        *getkey*, to simulate the user."""
+        self.keys.extend(keys)
 
+    def getkey(self, block: bool = True) -> str:
+        """Return the next key given to *feed_keys*, or None if there is no
+        key left (even if *block* is True, since no key will ever come)."""
+        return self.keys.popleft() if self.keys else None
 
     def copy(self):
-        return Frame(self.scr)
+        frame = HeadlessFrame(self.buffer.height, self.buffer.width)
+        frame.colors = self.colors
+        return frame
+
+    def get_line(self, y: int) -> str:
+        """Return the text of the line *y*."""
+        return self.buffer.get_line(y)
+
+    def get_cell(self, y: int, x: int) -> tuple[str, int]:
+        """Return the character and the attribute of a cell."""
+        return self.buffer.chars[y][x], self.buffer.attrs[y][x]
+
+    def get_lines(self) -> list[str]:
+        """Return the text of all the lines."""
+        return [self.buffer.get_line(y) for y in range(self.buffer.height)]
 
 
 def main(stdscr):
@@ -48,5 +595,3 @@ def main(stdscr):
 
 if __name__ == '__main__':
     curses.wrapper(main)
-
-
@@ -0,0 +1,106 @@
+"""
+Module to animate grids of cells, like cellular automata.
+The state of the grid is a NumPy array, and the next state is computed for
+the whole array at once by a step function. Each step of the animation only
+writes the lines of the grid that changed, each line as a single string, so
+a full screen simulation makes a few writes per step instead of one per cell.
+
+NumPy is only needed by this module.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from frame import DrawBatch
+
+
+def life_step(cells):
+    """Compute the next generation of Conway's Game of Life.
+    The grid wraps around its edges.
+    Args:
+        cells (numpy.ndarray): The grid, 1 for a live cell and 0 for a dead
+                               one.
+    Returns:
+        numpy.ndarray: The next generation.
+    """
+    # number of live neighbours of each cell
+    rows = cells + np.roll(cells, 1, 0) + np.roll(cells, -1, 0)
+    neighbours = rows + np.roll(rows, 1, 1) + np.roll(rows, -1, 1) - cells
+    return ((neighbours == 3) | ((cells == 1) & (neighbours == 2))
+            ).astype(cells.dtype)
+
+
+def grid(y: int, x: int, cells, step, chars: str = " █", col: int = None,
+         steps: int = -1):
+    """Animate a grid of cells, whose next state is computed by *step*.
+    The first step draws the whole grid, and the next ones only draw the
+    lines that changed.
+    Args:
+        y (int): The line of the top of the grid.
+        x (int): The column of the left of the grid.
+        cells (array-like): The initial state, a 2D array of integers, each
+                            cell being shown with the character of *chars*
+                            at its index.
+        step (function): The function that computes the next state from a
+                         state, as NumPy arrays.
+        chars (str): The character of each value of the cells.
+        col (int): The color of the grid (defaults to None for no color).
+        steps (int): The number of steps computed after the initial state.
+                     Default to -1 that means endless (as any negative
+                     number).
+    Returns:
+        function: The corresponding animation function.
+    Raises:
+        ImportError: If NumPy is not installed.
+    """
+    if np is None:
+        raise ImportError("The grid primitive needs NumPy")
+    initial = np.array(cells)
+    height, width = initial.shape
+    # value -> character
+    table = np.array(list(chars), dtype="<U1")
+    line_type = f"<U{width}"
+    def grid_generator(frame):
+        state = initial
+        previous = None
+        count = steps
+        while True:
+            if previous is None:
+                changed = np.arange(height)
+            else:
+                changed = np.flatnonzero((state != previous).any(axis=1))
+            if len(changed):
+                # the characters of each line, viewed as a single string
+                lines = table[state[changed]].view(line_type).ravel()
+                length = len(changed)
+                yield [DrawBatch((changed + y).tolist(), [x] * length,
+                                 lines.tolist(), [0] * length,
+                                 None if col is None else [col] * length)]
+            else:
+                yield []
+            if count == 0:
+                return
+            count -= 1
+            previous, state = state, step(state)
+    return grid_generator
+
+
+def life(y: int, x: int, cells, chars: str = " █", col: int = None,
+         steps: int = -1):
+    """Play Conway's Game of Life from the grid *cells* (1 for a live cell,
+    0 for a dead one). See *grid* for the arguments."""
+    return grid(y, x, cells, life_step, chars, col, steps)
+
+
+def random_cells(height: int, width: int, density: float = 0.3,
+                 seed: int = None):
+    """Return a grid of random cells, *density* being the probability for a
+    cell to be alive.
+    Raises:
+        ImportError: If NumPy is not installed.
+    """
+    if np is None:
+        raise ImportError("The grid primitive needs NumPy")
+    generator = np.random.default_rng(seed)
+    return (generator.random((height, width)) < density).astype(np.uint8)
@@ -0,0 +1,88 @@
+"""
+Module to compute the steps of an animation ahead of time, in a background
+thread, while the player waits between the frames.
+"""
+import threading
+from queue import Queue, Empty, Full
+
+# delay between two checks of the stop event, in seconds
+STOP_POLL_DELAY = 0.1
+
+
+class ProducerError:
+    """Wraps an exception raised by the animation in the producer thread, so
+    it can be raised again in the player."""
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+# put in the queue after the last step
+END = object()
+
+
+class Lookahead:
+    def __init__(self, anim, size: int = 8) -> None:
+        """Start computing the steps of *anim* in a background thread.
+        Args:
+            anim (Anim): The animation. It must not be used by anything else
+                         while the lookahead is running.
+            size (int): The maximum number of steps computed ahead.
+        Raises:
+            ValueError: If *size* is not strictly positive.
+        """
+        if size < 1:
+            raise ValueError("The *size* parameter must be strictly positive")
+        self.anim = anim
+        self.ready = Queue(maxsize=int(size))
+        self.stop = threading.Event()
+        # number of times a step was asked while none was ready (the first
+        # step is not counted, since nothing can be ready before it)
+        self.underruns = 0
+        self.__first__ = True
+        self.thread = threading.Thread(target=self.__produce__, daemon=True)
+        self.thread.start()
+
+    def __produce__(self) -> None:
+        """Put the steps of the animation in the queue, until the end or until
+        the lookahead is closed."""
+        try:
+            for modif_list in self.anim:
+                if not self.__put__(modif_list):
+                    return
+            self.__put__(END)
+        except BaseException as error:
+            self.__put__(ProducerError(error))
+
+    def __put__(self, item) -> bool:
+        """Put *item* in the queue, waiting for a free place. Return False if
+        the lookahead was closed meanwhile."""
+        while not self.stop.is_set():
+            try:
+                self.ready.put(item, timeout=STOP_POLL_DELAY)
+                return True
+            except Full:
+                pass
+        return False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> list:
+        try:
+            item = self.ready.get_nowait()
+        except Empty:
+            if not self.__first__:
+                self.underruns += 1
+            item = self.ready.get()
+        self.__first__ = False
+        if item is END:
+            raise StopIteration
+        if isinstance(item, ProducerError):
+            raise item.error
+        return item
+
+    def close(self) -> None:
+        """Stop the background thread."""
+        self.stop.set()
+        self.thread.join()
@@ -0,0 +1,140 @@
+"""
+Module that optimizes animations before they are played.
+The >>, << and & operators only record how the animations are combined (as
+*Composition* and *Sequence* nodes over *Anim* leaves), so this graph can be
+compiled into an equivalent one that is cheaper to play :
+ - nested compositions and sequences are flattened, their delays becoming
+   offsets of their first layers or segments (the delays of the layers are
+   offsets that the compositions do not step through),
+ - consecutive color ramps (fadein, fadeout, color_ramp...) of the same text
+   in a sequence are merged into one ramp (the compiled sequence still gives
+   the index of the segment being played to the original one, see
+   *Sequence.segment_index*),
+ - layers that are always fully covered by a layer above them are dropped.
+"""
+from animations import Anim, Composition, Sequence
+from primitives import ColorRamp
+
+
+def unwrap(anim):
+    """If *anim* is only a copy of a composition or of a sequence, return
+    this composition or sequence (with the delay of *anim*)."""
+    function = anim.__anim_function__
+    owner = getattr(function, "__self__", None)
+    if type(anim) is Anim and isinstance(owner, (Composition, Sequence)):
+        return owner.delayed(anim.__delay__)
+    return anim
+
+
+def get_ramp(anim):
+    """Return the ColorRamp played by *anim*, or None."""
+    function = anim.__anim_function__
+    if type(anim) is Anim and isinstance(function, ColorRamp):
+        return function
+    return None
+
+
+def covers(upper, lower) -> bool:
+    """Tell if the layer *upper* writes over all the cells written by the
+    layer *lower*, at every step of *lower*."""
+    upper_ramp, lower_ramp = get_ramp(upper), get_ramp(lower)
+    if upper_ramp is None or lower_ramp is None or len(lower_ramp) == 0:
+        return False
+    if "\n" in upper_ramp.string or "\n" in lower_ramp.string:
+        # only single lines are compared
+        return False
+    return (upper_ramp.y == lower_ramp.y
+            and upper_ramp.x <= lower_ramp.x
+            and (upper_ramp.x + len(upper_ramp.string)
+                 >= lower_ramp.x + len(lower_ramp.string))
+            and upper.__delay__ <= lower.__delay__
+            and (upper.__delay__ + len(upper_ramp)
+                 >= lower.__delay__ + len(lower_ramp)))
+
+
+def compile_composition(anim: Composition):
+    layers = []
+    for layer in anim.layers:
+        layer = compile_animation(layer)
+        if isinstance(layer, Sequence) and len(layer.segments) == 1:
+            # the index of the segment of a layer is not seen from outside
+            layer = layer.segments[0].delayed(layer.__delay__)
+        if isinstance(layer, Composition):
+            layers.extend(sublayer.delayed(layer.__delay__)
+                          for sublayer in layer.layers)
+        else:
+            layers.append(layer)
+    # drop the layers that are covered by one of the layers above them
+    layers = [layer for index, layer in enumerate(layers)
+              if not any(covers(upper, layer) for upper in layers[index + 1:])]
+    if len(layers) == 1:
+        return layers[0].delayed(anim.__delay__)
+    return Composition(anim.frame, layers, anim.__delay__)
+
+
+def merge_ramps(frame, segments: list, owners: list) -> tuple[list, list]:
+    """Merge the consecutive ramps of the same text in *segments*.
+    Args:
+        segments (list[Anim]): The segments.
+        owners (list[tuple]): The owners of each segment (see
+                              *Sequence.owners*).
+    Returns:
+        tuple[list, list]: The merged segments, and their owners.
+    """
+    merged, merged_owners = [], []
+    for segment, owner in zip(segments, owners):
+        ramp = get_ramp(segment)
+        previous = get_ramp(merged[-1]) if merged else None
+        if (ramp is not None and previous is not None
+                and segment.__delay__ == 0
+                and (ramp.y, ramp.x, ramp.string)
+                == (previous.y, previous.x, previous.string)):
+            # the ramp starts when the previous one ends
+            start = merged[-1].__delay__ + len(previous)
+            merged[-1] = Anim(frame,
+                              ColorRamp(ramp.y, ramp.x, ramp.string,
+                                        previous.cols + ramp.cols),
+                              after=merged[-1].__delay__)
+            merged_owners[-1] += tuple(
+                (start + offset, index) for offset, index in owner
+                if index != merged_owners[-1][-1][1])
+        else:
+            merged.append(segment)
+            merged_owners.append(owner)
+    return merged, merged_owners
+
+
+def compile_sequence(anim: Sequence):
+    segments = []
+    owners = []
+    for index, segment in enumerate(anim.segments):
+        segment = compile_animation(segment)
+        if isinstance(segment, Sequence) and segment.segments:
+            subsegments = list(segment.segments)
+            subsegments[0] = subsegments[0].delayed(segment.__delay__)
+        else:
+            subsegments = [segment]
+        segments.extend(subsegments)
+        owners.extend([((0, index),)] * len(subsegments))
+    segments, owners = merge_ramps(anim.frame, segments, owners)
+    # always a sequence, even with one segment, so that the index of the
+    # segment being played is given to *anim*
+    compiled = Sequence(anim.frame, segments, anim.__delay__)
+    compiled.source, compiled.owners = anim, owners
+    return compiled
+
+
+def compile_animation(anim):
+    """Return an animation that plays the same thing as *anim*, but cheaper.
+    The animations *anim* is made of are not modified.
+    Args:
+        anim (Anim): The animation to compile.
+    Returns:
+        Anim: The compiled animation (it may be *anim* itself).
+    """
+    anim = unwrap(anim)
+    if isinstance(anim, Composition):
+        return compile_composition(anim)
+    if isinstance(anim, Sequence):
+        return compile_sequence(anim)
+    return anim
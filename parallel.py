@@ -0,0 +1,174 @@
+"""
+Module to compute heavy layers in worker processes.
+The layers of a composition are independent until they are merged, so a
+layer whose steps are expensive to compute (a simulation, a procedural
+animation...) can run in its own process. The worker sends back, for each
+step, the writes that the layer makes as plain data, and the composition
+merges them in the main process, in the order of the layers.
+"""
+import multiprocessing
+from queue import Empty
+
+from frame import HeadlessFrame, DrawBatch
+
+# delay between two checks that a worker is still alive, in seconds
+WORKER_POLL_DELAY = 0.5
+
+
+def clear_frame(frame) -> None:
+    """Frame modification that clears the frame (it can be pickled, unlike
+    a lambda)."""
+    frame.clear()
+
+
+class CaptureFrame(HeadlessFrame):
+    """A frame that records the writes of each step, instead of drawing them.
+    The colors are kept as they are given, so they are resolved by the frame
+    that the steps are finally applied to.
+    """
+
+    def __init__(self, height: int = 24, width: int = 80) -> None:
+        super().__init__(height, width)
+        self.__step__ = []
+        self.__batch__ = None
+
+    def __write__(self, y: int, x: int, text: str, attr: int = 0,
+                  col: int = None) -> None:
+        if self.__batch__ is None:
+            self.__batch__ = DrawBatch()
+            self.__step__.append(self.__batch__)
+        self.__batch__.append(y, x, text, attr, col)
+        self.cursor = (y, x + len(text))
+
+    def clear(self):
+        self.__step__.append(clear_frame)
+        self.__batch__ = None
+
+    def take_step(self) -> list:
+        """Return the modifications recorded since the last call."""
+        step, self.__step__, self.__batch__ = self.__step__, [], None
+        return step
+
+
+def render_layer(factory, args, height: int, width: int, chunk_size: int,
+                 queue) -> None:
+    """Compute the steps of a layer, and put them in *queue* by chunks of
+    *chunk_size* steps, as tuples (steps, finished). The first chunk only has
+    one step, so that the first frame does not wait for a whole chunk. If the
+    animation raises an exception, its description is put instead of the
+    steps.
+    This is the function run by the worker processes.
+    """
+    from animations import Anim, Idle
+    frame = CaptureFrame(height, width)
+    chunk = []
+    size = 1
+    try:
+        for modif_list in Anim(frame, factory(*args)):
+            if type(modif_list) is Idle:
+                # sent as it is, so the composition keeps its duration
+                chunk.append(modif_list)
+            else:
+                frame.apply(modif_list)
+                chunk.append(frame.take_step())
+            if len(chunk) >= size:
+                queue.put((chunk, False))
+                chunk = []
+                size = chunk_size
+    except Exception as error:
+        queue.put((f"{type(error).__name__}: {error}", True))
+        return
+    queue.put((chunk, True))
+
+
+class ProcessLayer:
+    def __init__(self, factory, *args, chunk_size: int = 32,
+                 max_chunks: int = 4) -> None:
+        """An animation function whose steps are computed in a worker process.
+        Example:
+            Anim(frame, ProcessLayer(game_of_life, 0, 0, 100))
+            plays the animation *game_of_life(0, 0, 100)* from a worker.
+        Args:
+            factory (function): A function that returns the animation function
+                                of the layer. It must be defined at the top
+                                level of a module, so it can be pickled.
+            args: The arguments of *factory* (they must be picklable too).
+            chunk_size (int): The number of steps sent at once by the worker.
+            max_chunks (int): The maximum number of chunks computed ahead.
+        """
+        self.factory = factory
+        self.args = args
+        self.chunk_size = int(chunk_size)
+        self.max_chunks = int(max_chunks)
+
+    def __call__(self, frame):
+        """Start a worker process, and return an iterator over the steps that
+        it computes."""
+        height, width = frame.getmaxyx()
+        return LayerWorker(self, height, width)
+
+
+class LayerWorker:
+    """Iterator over the steps computed by a worker process for a
+    *ProcessLayer*. The worker is started when the iterator is created, and
+    stopped when the iterator is finished, closed or garbage collected.
+    """
+
+    def __init__(self, layer, height: int, width: int) -> None:
+        self.queue = multiprocessing.Queue(maxsize=layer.max_chunks)
+        self.process = multiprocessing.Process(
+            target=render_layer,
+            args=(layer.factory, layer.args, height, width, layer.chunk_size,
+                  self.queue),
+            daemon=True)
+        self.process.start()
+        self.__chunk__ = iter(())
+        self.__finished__ = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> list:
+        while True:
+            for step in self.__chunk__:
+                return step
+            if self.__finished__ or self.process is None:
+                self.close()
+                raise StopIteration
+            chunk, self.__finished__ = self.__receive__()
+            if isinstance(chunk, str):
+                self.close()
+                raise RuntimeError(f"Error in a layer worker : {chunk}")
+            self.__chunk__ = iter(chunk)
+
+    def __receive__(self) -> tuple:
+        """Wait for the next chunk of the worker.
+        Raises:
+            RuntimeError: If the worker died without sending it.
+        """
+        while True:
+            try:
+                return self.queue.get(timeout=WORKER_POLL_DELAY)
+            except Empty:
+                if self.process.is_alive():
+                    continue
+            # what the worker sent before it stopped may still be in the pipe
+            try:
+                return self.queue.get(timeout=WORKER_POLL_DELAY)
+            except Empty:
+                code = self.process.exitcode
+                self.close()
+                raise RuntimeError(
+                    f"A layer worker died (exit code {code})") from None
+
+    def close(self) -> None:
+        """Stop the worker."""
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.process = None
+
+    def __del__(self) -> None:
+        self.close()
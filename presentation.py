@@ -0,0 +1,243 @@
+"""
+Module to play presentations : animations split into slides, with the
+ability to go back and forward between the slides.
+
+Going to a slide needs the screen as it was when the slide started. So the
+player keeps a snapshot of the screen at the start of every few slides (a
+keyframe). To go to a slide, it restores the nearest keyframe before it, and
+only replays (without showing them) the slides between the keyframe and the
+wanted slide. A slide that never ends (like a repeated spinner) is only
+replayed for MAX_REPLAY_STEPS steps, and the screen is then set to what it was
+when the slide was last left.
+"""
+from animations import Anim, Sequence
+from scheduler import FrameScheduler
+from anim_player import FRAME_DELAY
+
+NEXT_KEYS = ("KEY_RIGHT", "KEY_DOWN", "KEY_NPAGE", " ", "n", "l", "j")
+PREVIOUS_KEYS = ("KEY_LEFT", "KEY_UP", "KEY_PPAGE", "KEY_BACKSPACE", "p",
+                 "h", "k")
+FIRST_KEYS = ("KEY_HOME",)
+LAST_KEYS = ("KEY_END", "G")
+QUIT_KEYS = ("q", "\x1b")
+# keys that validate the number of the slide to go to
+GOTO_KEYS = ("\n", "KEY_ENTER", "g")
+# returned by *Presentation.handle_key* to quit the presentation
+QUIT = -1
+# number of steps after which a replayed slide is considered endless
+MAX_REPLAY_STEPS = 10_000
+
+
+class Presentation:
+    def __init__(self, frame, slides, keyframe_interval: int = 10,
+                 fps: float = 1 / FRAME_DELAY) -> None:
+        """Initialize the presentation.
+        Args:
+            frame (Frame): The frame to play the presentation on.
+            slides (list[Anim] or Sequence): The slides. A *Sequence* (made
+                with the & operator) has one slide per segment.
+            keyframe_interval (int): Keep a snapshot of the screen at the
+                                     start of every *keyframe_interval*
+                                     slides.
+            fps (float): The target number of frames per second.
+        Raises:
+            ValueError: If *keyframe_interval* is not strictly positive.
+        """
+        if keyframe_interval < 1:
+            raise ValueError(
+                "The *keyframe_interval* parameter must be strictly positive")
+        self.frame = frame
+        if isinstance(slides, Sequence):
+            slides = slides.segments
+        self.slides = [slide if isinstance(slide, Anim) else Anim(frame, slide)
+                       for slide in slides]
+        self.keyframe_interval = int(keyframe_interval)
+        self.fps = fps
+        # slide index -> snapshot of the screen at the start of the slide
+        self.keyframes = {0: frame.buffer.snapshot()}
+        # index of the slide whose start is the current content of the
+        # buffer, or None if the buffer is in the middle of a slide
+        self.position = 0
+        # index of the slide that is shown
+        self.current = 0
+        # digits typed to go to a slide
+        self.__typed__ = ""
+        # slide index -> snapshot of the screen when the slide was last left,
+        # for the slides that may be endless (see *__leave__*)
+        self.__left__ = {}
+        # indexes of the slides whose replay reached MAX_REPLAY_STEPS
+        self.__endless__ = set()
+
+    def __len__(self) -> int:
+        return len(self.slides)
+
+    def __reach__(self, index: int) -> None:
+        """Record that the buffer is at the start of the slide *index*, and
+        keep a keyframe if it is one."""
+        self.position = index
+        if index % self.keyframe_interval == 0 and index not in self.keyframes:
+            self.keyframes[index] = self.frame.buffer.snapshot()
+
+    def seek(self, index: int) -> None:
+        """Set the buffer to what the screen is at the start of the slide
+        *index*, without showing it.
+        The nearest keyframe before the slide is restored, unless the buffer
+        is already closer, and the slides in between are replayed without
+        being shown.
+        Args:
+            index (int): The index of the slide.
+        Raises:
+            IndexError: If there is no such slide.
+        """
+        if not 0 <= index < len(self.slides):
+            raise IndexError("slide index out of range")
+        keyframe = max(i for i in self.keyframes if i <= index)
+        if self.position is None or not keyframe <= self.position <= index:
+            self.frame.buffer.restore(self.keyframes[keyframe])
+            self.__reach__(keyframe)
+        while self.position < index:
+            self.__replay__(self.position)
+            self.__reach__(self.position + 1)
+
+    def __replay__(self, index: int) -> None:
+        """Apply the slide *index* to the buffer until its end, without
+        showing it. An endless slide is stopped after MAX_REPLAY_STEPS steps
+        (and not replayed again), and the buffer is then set to what it was
+        when the slide was last left, if it was played."""
+        if index not in self.__endless__ or index not in self.__left__:
+            steps = 0
+            for modif_list in self.slides[index].clone():
+                self.frame.apply(modif_list)
+                steps += getattr(modif_list, "ticks", 1)
+                if steps >= MAX_REPLAY_STEPS:
+                    self.__endless__.add(index)
+                    break
+            else:
+                return
+        if index in self.__left__:
+            self.frame.buffer.restore(self.__left__[index])
+
+    def play_slide(self, index: int) -> int:
+        """Play the slide *index* from the current buffer.
+        The keys pressed while the slide is playing are handled, and the slide
+        is interrupted by a key that goes to another slide.
+        Returns:
+            int: What the key that interrupted the slide asks (see
+                 *handle_key*), or None if the slide was played until its end.
+        """
+        self.current = index
+        self.position = None
+        scheduler = None
+        if self.fps is not None and self.frame.realtime:
+            scheduler = FrameScheduler(self.fps)
+            scheduler.start()
+        # the modifications of a dropped frame are not on the screen yet
+        pending = False
+        for modif_list in self.slides[index].clone():
+            if modif_list:
+                self.frame.apply(modif_list)
+                pending = not (scheduler is None or scheduler.should_render())
+                if not pending:
+                    self.frame.refresh()
+                ticks = 1
+            else:
+                # nothing is drawn : no refresh, only the keys are read
+                ticks = getattr(modif_list, "ticks", 1)
+                if pending:
+                    self.frame.refresh()
+                    pending = False
+            for _ in range(ticks):
+                if self.frame.poll_resize():
+                    self.frame.refresh()
+                    pending = False
+                key = self.frame.getkey(block=False)
+                if key is not None:
+                    target = self.handle_key(key)
+                    if target is not None:
+                        self.__leave__(index, False)
+                        return target
+                if scheduler is not None:
+                    scheduler.wait()
+        self.frame.refresh()
+        self.__leave__(index, True)
+        self.__reach__(index + 1)
+        return None
+
+    def __leave__(self, index: int, finished: bool) -> None:
+        """Keep a snapshot of the screen as the slide *index* is left, if it
+        can be needed to replay the slide : only the endless slides are not
+        replayed until their end. The snapshots of the slides found endless
+        are kept, and the one of the last slide that was interrupted (that
+        may be endless), so they do not add up as the slides are played.
+        Args:
+            index (int): The index of the slide.
+            finished (bool): The slide was played until its end.
+        """
+        if finished and index not in self.__endless__:
+            self.__left__.pop(index, None)
+            return
+        self.__left__ = {i: snapshot for i, snapshot in self.__left__.items()
+                         if i in self.__endless__}
+        self.__left__[index] = self.frame.buffer.snapshot()
+
+    def handle_key(self, key: str) -> int:
+        """Tell what to do when *key* is pressed.
+        Args:
+            key (str): The name of the key, or None if no key will ever come.
+        Returns:
+            int: The index of the slide to go to, QUIT to quit the
+                 presentation, or None to stay on the current slide.
+        """
+        if key is None or key in QUIT_KEYS:
+            return QUIT
+        if key == "KEY_RESIZE":
+            # the frame resized itself, and the typed number is kept
+            return None
+        if key.isdigit():
+            self.__typed__ += key
+            return None
+        typed, self.__typed__ = self.__typed__, ""
+        last = len(self.slides) - 1
+        if key in GOTO_KEYS and typed:
+            return min(max(int(typed) - 1, 0), last)
+        if key in NEXT_KEYS and self.current < last:
+            return self.current + 1
+        if key in PREVIOUS_KEYS and self.current > 0:
+            return self.current - 1
+        if key in FIRST_KEYS:
+            return 0
+        if key in LAST_KEYS:
+            return last
+        return None
+
+    def run(self, start: int = 0) -> None:
+        """Play the presentation, and let the user navigate between the
+        slides, until a quit key is pressed.
+        Args:
+            start (int): The index of the first slide to show.
+        """
+        index = start
+        while index != QUIT:
+            self.seek(index)
+            index = self.play_slide(index)
+            # wait for a key that changes the slide
+            while index is None:
+                index = self.handle_key(self.frame.getkey())
+
+
+def present(frame, slides, keyframe_interval: int = 10, start: int = 0,
+            fps: float = 1 / FRAME_DELAY) -> Presentation:
+    """Play a presentation on the frame.
+    Args:
+        frame (Frame): The frame to play the presentation on.
+        slides (list[Anim] or Sequence): The slides.
+        keyframe_interval (int): Keep a snapshot of the screen at the start of
+                                 every *keyframe_interval* slides.
+        start (int): The index of the first slide to show.
+        fps (float): The target number of frames per second.
+    Returns:
+        Presentation: The presentation, once the user quit it.
+    """
+    presentation = Presentation(frame, slides, keyframe_interval, fps)
+    presentation.run(start)
+    return presentation
@@ -4,7 +4,13 @@ This module contains all the basic animations. They are called primitives.
 
 
 from animations import *
+from frame import DrawOp, DrawBatch
+from colors import to_color, split_color
 import curses
+from bisect import bisect_right
+from fractions import Fraction
+from functools import lru_cache
+from math import cos, hypot, pi
 from random import randint
 
 # ╺┳╸╻┏┳┓╻┏┓╻┏━╸
@@ -19,12 +25,15 @@ def Pause(frame):
     return Anim(frame, frame.pause())
 
 
-# FIXME: add a closure
 def Wait(frame, anim, delay: int =100):
-    """Wait for *delay* units."""
-    for _ in range(int(delay)):
-        yield []
-    yield from anim(frame)
+    """Wait for *delay* units, then play *anim*.
+    The wait is the delay of the returned animation, so it is an offset that
+    compositions do not have to step through.
+    Returns:
+        Anim: The delayed animation.
+    """
+    return Anim(frame, anim if isinstance(anim, Anim) else Anim(frame, anim),
+                after=int(delay))
 
 
 # FIXME
@@ -32,6 +41,19 @@ def Noop(frame):
     yield []
 
 
+def idle(delay: int):
+    """Draw nothing for *delay* units.
+    This is one *Idle* step, so the players sleep until its end instead of
+    going through each unit.
+    Returns:
+        function: The corresponding animation function.
+    """
+    step = Idle(int(delay))
+    def idle_generator(frame):
+        yield step
+    return idle_generator
+
+
 # ┏┓ ┏━┓┏━┓╻┏━╸   ╺┳╸┏━╸╻ ╻╺┳╸
 # ┣┻┓┣━┫┗━┓┃┃      ┃ ┣╸ ┏╋┛ ┃
 # ┗━┛╹ ╹┗━┛╹┗━╸    ╹ ┗━╸╹ ╹ ╹
@@ -51,15 +73,17 @@ def text(y: int, x: int, string: str, col: int =None):
         y (int): The line to add the text at.
         x (int): The column to add the text at.
         string (str): The text to add.
-        col (int): The color of the text.
+        col (int or tuple[int, int]): The color of the text, or its
+                                      (foreground, background) colors.
     Returns:
         function: The corresponding animation function.
     """
+    # the modification is plain data, created once for every run
+    step = [DrawOp(int(y), int(x), str(string), 0,
+                   to_color(col))]
     # closure so ou return a function, not a generator
     def text_generator(frame):
-        # second closure so that what is yielded is a function of *frame*.
-        yield [lambda frame:
-                frame.put_text(int(y), int(x), str(string), int(col))]
+        yield step
     return text_generator
 
 
@@ -67,70 +91,426 @@ def addstr(*args, **kwargs):
     """Copy of the curses window.addstr function.
     It accepts more parameters than the *text* primitive, so you can have more
     advanced styles, like bold, italics, under line, etc.
+    The color pair *n* of an attribute (curses.color_pair(n)) shows the color
+    *n* of the 256 colors palette.
     """
-    def addstr_generator(frame):
-        yield [lambda frame:
+    if not kwargs and len(args) in (3, 4):
+        # (y, x, str) or (y, x, str, attr) : store it as plain data
+        y, x, string, *attr = args
+        attr, col = split_color(int(attr[0]) if attr else 0)
+        step = [DrawOp(int(y), int(x), str(string), attr, col)]
+    else:
+        step = [lambda frame:
                 frame.addstr(*args, **kwargs)]
+    def addstr_generator(frame):
+        yield step
     return addstr_generator
 
+
 # ⢎⡑ ⡇ ⡷⢾ ⣏⡱ ⡇  ⣏⡉   ⢹⠁ ⣏⡉ ⢇⡸ ⢹⠁   ⢎⡑ ⢹⠁ ⢇⢸ ⡇  ⣏⡉ ⢎⡑
 # ⠢⠜ ⠇ ⠇⠸ ⠇  ⠧⠤ ⠧⠤   ⠸  ⠧⠤ ⠇⠸ ⠸    ⠢⠜ ⠸   ⠇ ⠧⠤ ⠧⠤ ⠢⠜
 
 def bold(y: int, x: int, string: str, col: int =None):
+    step = [DrawOp(int(y), int(x), str(string), curses.A_BOLD,
+                   to_color(col))]
     def bold_generator(frame):
-        if col is None:
-            color = 0
-        else:
-            color = int(col)
-        yield from addstr(int(y), int(x), str(string), curses.A_BOLD + curses.color_pair(color))(frame)
+        yield step
     return bold_generator
 
 
-def italic(y: int, x: int, string: str):
-    def bold_generator(frame):
-        if col is None:
-            color = 0
-        else:
-            color = int(col)
-        yield from addstr(int(y), int(x), str(string), curses.A_ITALIC + curses.color_pair(color))(frame)
+def italic(y: int, x: int, string: str, col: int =None):
+    step = [DrawOp(int(y), int(x), str(string), curses.A_ITALIC,
+                   to_color(col))]
+    def italic_generator(frame):
+        yield step
+    return italic_generator
 
 
 # ⣏⡉ ⣎⣱ ⡏⢱ ⣏⡉   ⣏⡉ ⣏⡉ ⣏⡉ ⣏⡉ ⡎⠑ ⢹⠁ ⢎⡑
 # ⠇  ⠇⠸ ⠧⠜ ⠧⠤   ⠧⠤ ⠇  ⠇  ⠧⠤ ⠣⠔ ⠸  ⠢⠜
 # effects that only change the color of the same text
 
+class ColorRamp:
+    """Animation function that shows a string with one color per step.
+    The steps are created once, so playing it only yields them. Since it is
+    plain data, the optimizer (see *optimizer.compile_animation*) can merge
+    consecutive ramps of the same text.
+    """
+
+    def __init__(self, y: int, x: int, string: str, col_ramp,
+                 name: str = "color_ramp") -> None:
+        """Initialize the ramp.
+        Args:
+            y (int): The line to add the text at.
+            x (int): The column to add the text at.
+            string (str): The text to add.
+            col_ramp (list[int]): The color of each step (a number or a tuple
+                                  (foreground, background)). A color of None
+                                  shows the string invisible.
+            name (str): The name of the animation (used by the profiler).
+        """
+        self.y, self.x, self.string = int(y), int(x), str(string)
+        self.cols = [to_color(col) for col in col_ramp]
+        self.steps = [[DrawOp(self.y, self.x, self.string, curses.A_INVIS)]
+                      if col is None
+                      else [DrawOp(self.y, self.x, self.string, 0, col)]
+                      for col in self.cols]
+        self.__name__ = name
+
+    def __len__(self) -> int:
+        """Return the number of steps."""
+        return len(self.steps)
+
+    def __call__(self, frame):
+        return iter(self.steps)
+
+
 def fadein(y: int, x: int, string: str):
-    def fadein_generator(frame):
-        # yield invisibe at the beginning
-        yield from addstr(y, x, string, curses.A_INVIS)(frame)
-        for col in range(233, 256):
-            yield from text(y, x, string, col)(frame)
-    return fadein_generator
+    # invisible at the beginning
+    return ColorRamp(y, x, string, [None, *range(233, 256)], "fadein")
 
 
 def fadeout(y: int, x: int, string: str):
-    def fadeout_generator(frame):
-        for col in reversed(range(233, 256)):
-            yield from text(y, x, string, col)(frame)
-        # yield invisible at the end, because 233 is not exactly black
-        yield from addstr(y, x, string, curses.A_INVIS)(frame)
-    return fadeout_generator
+    # invisible at the end, because 233 is not exactly black
+    return ColorRamp(y, x, string, [*reversed(range(233, 256)), None],
+                     "fadeout")
 
 
 def fadeinout(y: int, x: int, string: str):
-    def fadeinout_generator(frame):
-        yield from fadein(y, x, string)(frame)
-        yield from fadeout(y, x, string)(frame)
-    return fadeinout_generator
+    return ColorRamp(y, x, string, [None, *range(233, 256),
+                                    *reversed(range(233, 256)), None],
+                     "fadeinout")
 
 
 def color_ramp(y: int, x: int, string: str, col_ramp: list[int]):
     """Show a string with its colors following the given *col_ramp*.
     Can be used to make color effects like random colors, fade int..."""
-    def color_ramp_generator(frame):
-        for col in col_ramp:
-            yield from text(y, x, string, col)(frame)
-    return color_ramp_generator
+    return ColorRamp(y, x, string, col_ramp)
+
+
+# ┏━┓┏━┓┏━┓╻╺┳╸┏━╸┏━┓
+# ┗━┓┣━┛┣┳┛┃ ┃ ┣╸ ┗━┓
+# ┗━┛╹  ╹┗╸╹ ╹ ┗━╸┗━┛
+# multi-line art, drawn in one batch
+
+# number of clipped positions that a sprite keeps
+SPRITE_CACHE_SIZE = 64
+
+class Sprite:
+    """Multi-line art, like a logo or a diagram.
+    The rows are split once into the runs of cells to draw (the cells equal
+    to *transparent* are not drawn, so what is under them stays visible), and
+    each blit is a single *DrawBatch*, clipped to the screen. The batches of
+    the last positions are kept, so drawing the sprite again at the same place
+    costs nothing.
+    """
+
+    def __init__(self, art, transparent: str = " ", col: int = None,
+                 attr: int = 0) -> None:
+        """Initialize the sprite.
+        Args:
+            art (str or list[str]): The rows of the sprite, as a list or as a
+                                    string with one row per line.
+            transparent (str): The character of the cells that are not drawn
+                               (None for no transparent cell).
+            col (int): The color of the sprite (defaults to None for no
+                       color).
+            attr (int): The curses attribute of the sprite.
+        """
+        self.rows = art.split("\n") if isinstance(art, str) else [
+            str(row) for row in art]
+        # the frame has one character per cell
+        self.widths = [len(row) for row in self.rows]
+        self.height = len(self.rows)
+        self.width = max(self.widths, default=0)
+        self.col = to_color(col)
+        self.attr = int(attr)
+        # (line, column, string) of the runs of cells that are drawn
+        self.runs = []
+        for dy, row in enumerate(self.rows):
+            if transparent is None:
+                if row:
+                    self.runs.append((dy, 0, row))
+                continue
+            start = None
+            for dx, char in enumerate(row):
+                if char == transparent:
+                    if start is not None:
+                        self.runs.append((dy, start, row[start:dx]))
+                        start = None
+                elif start is None:
+                    start = dx
+            if start is not None:
+                self.runs.append((dy, start, row[start:]))
+        # (y, x, height, width) -> batch of the sprite at this position
+        self.__batches__ = {}
+
+    def blit(self, y: int, x: int, height: int, width: int) -> DrawBatch:
+        """Return the batch of writes that draws the sprite with its top left
+        corner at (y, x), on a screen of *height* lines and *width* columns.
+        The cells outside of the screen are not written.
+        """
+        key = (y, x, height, width)
+        batch = self.__batches__.get(key)
+        if batch is not None:
+            return batch
+        ys, xs, strings = [], [], []
+        for dy, dx, string in self.runs:
+            line = y + dy
+            if line < 0 or line >= height:
+                continue
+            start = x + dx
+            stop = min(start + len(string), width)
+            if stop <= max(start, 0):
+                # the whole run is left or right of the screen
+                continue
+            if start < 0:
+                string = string[-start:stop - start]
+                start = 0
+            else:
+                string = string[:stop - start]
+            if string:
+                ys.append(line)
+                xs.append(start)
+                strings.append(string)
+        batch = DrawBatch(ys, xs, strings, [self.attr] * len(ys),
+                          None if self.col is None else [self.col] * len(ys))
+        if len(self.__batches__) >= SPRITE_CACHE_SIZE:
+            self.__batches__.clear()
+        self.__batches__[key] = batch
+        return batch
+
+
+def sprite(y: int, x: int, art, transparent: str = " ", col: int = None,
+           attr: int = 0):
+    """Show multi-line art with its top left corner at (y, x), clipped to
+    the frame.
+    Args:
+        y (int): The line of the top of the art.
+        x (int): The column of the left of the art.
+        art (Sprite, str or list[str]): The art, or its rows (see *Sprite*).
+        transparent (str): The character of the cells that are not drawn.
+        col (int): The color of the art.
+        attr (int): The curses attribute of the art.
+    Returns:
+        function: The corresponding animation function.
+    """
+    image = art if isinstance(art, Sprite) else Sprite(art, transparent, col,
+                                                      attr)
+    y, x = int(y), int(x)
+    def sprite_generator(frame):
+        height, width = frame.getmaxyx()
+        yield [image.blit(y, x, height, width)]
+    return sprite_generator
+
+
+# ┏┳┓┏━┓╺┳╸╻┏━┓┏┓╻
+# ┃┃┃┃ ┃ ┃ ┃┃ ┃┃┗┫
+# ╹ ╹┗━┛ ╹ ╹┗━┛╹ ╹
+# text moving on the screen
+
+def linear(t: float) -> float:
+    return t
+
+
+def ease_in(t: float) -> float:
+    return t * t
+
+
+def ease_out(t: float) -> float:
+    return t * (2 - t)
+
+
+def ease_in_out(t: float) -> float:
+    return t * t * (3 - 2 * t)
+
+
+def ease_sine(t: float) -> float:
+    return (1 - cos(pi * t)) / 2
+
+
+# name -> easing function, from the progress in time (between 0 and 1) to
+# the progress on the path
+EASINGS = {
+    "linear": linear,
+    "in": ease_in,
+    "out": ease_out,
+    "in_out": ease_in_out,
+    "sine": ease_sine,
+}
+
+
+@lru_cache(maxsize=256)
+def easing_table(easing, duration: int) -> tuple[float, ...]:
+    """Return the progress on the path at each of the *duration* + 1 steps
+    of a motion. The table is computed once for each easing and duration, so
+    many objects moving the same way share it.
+    Args:
+        easing (str or function): The name of an easing of EASINGS, or a
+                                  function from the progress in time to the
+                                  progress on the path.
+        duration (int): The number of steps of the motion.
+    Returns:
+        tuple[float]: The progress of each step, from 0 to 1.
+    """
+    function = EASINGS[easing] if isinstance(easing, str) else easing
+    if duration <= 0:
+        return (1.0,)
+    return tuple(function(step / duration) for step in range(duration + 1))
+
+
+def blank_runs(cells, height: int, width: int) -> list[DrawOp]:
+    """Return the writes of spaces that erase the (y, x) *cells*, one for
+    each run of consecutive cells of a line, without the cells outside of a
+    screen of *height* lines and *width* columns."""
+    ops = []
+    run_y = run_x = length = None
+    for y, x in sorted(cells):
+        if not (0 <= y < height and 0 <= x < width):
+            continue
+        if y == run_y and x == run_x + length:
+            length += 1
+            continue
+        if length:
+            ops.append(DrawOp(run_y, run_x, " " * length))
+        run_y, run_x, length = y, x, 1
+    if length:
+        ops.append(DrawOp(run_y, run_x, " " * length))
+    return ops
+
+
+class Motion:
+    """Animation function that moves a text or a *Sprite* along a path, one
+    position per step. The steps are created once for each size of frame
+    (they only write the cells that the text leaves and the text itself), so
+    playing it only yields them. The steps where the text does not move are
+    merged into *Idle* steps.
+    The cells that the text leaves are erased with spaces, so what the lower
+    layers drew there is erased too, until they draw it again. With
+    erase=False they are not written at all, and keep showing the text until
+    something else is drawn over them.
+    """
+
+    def __init__(self, string, path, col: int = None, name: str = "move",
+                 erase: bool = True) -> None:
+        """Initialize the motion.
+        Args:
+            string (str or Sprite): The text to move (a string with several
+                                    lines is moved as a block), or a sprite
+                                    (its transparent cells are not drawn).
+            path (list[tuple[int, int]]): The (y, x) position of the top left
+                                          corner of the text at each step.
+            col (int): The color of the text (defaults to None for no color).
+                       A sprite has its own color.
+            name (str): The name of the animation (used by the profiler).
+            erase (bool): Erase the cells that the text leaves.
+        """
+        if isinstance(string, Sprite):
+            self.image = string
+        else:
+            self.image = Sprite(str(string), None, col)
+        self.path = [(int(y), int(x)) for y, x in path]
+        self.erase = erase
+        # (height, width) of the frame -> steps
+        self.__steps__ = {}
+        self.__name__ = name
+
+    def __make_steps__(self, height: int, width: int) -> list:
+        # (line, column) of the cells drawn by the text, from its corner
+        cells = [(dy, dx + offset) for dy, dx, string in self.image.runs
+                 for offset in range(len(string))]
+        steps = []
+        previous = None
+        # number of steps without moving since the last draw
+        still = 0
+        for y, x in self.path:
+            if (y, x) == previous:
+                still += 1
+                continue
+            if still:
+                steps.append(Idle(still))
+                still = 0
+            step = []
+            if previous is not None and self.erase:
+                old_y, old_x = previous
+                left = ({(old_y + dy, old_x + dx) for dy, dx in cells}
+                        - {(y + dy, x + dx) for dy, dx in cells})
+                step.extend(blank_runs(left, height, width))
+            step.append(self.image.blit(y, x, height, width))
+            steps.append(step)
+            previous = (y, x)
+        if still:
+            steps.append(Idle(still))
+        return steps
+
+    def __len__(self) -> int:
+        """Return the number of steps."""
+        return len(self.path)
+
+    def __call__(self, frame):
+        size = frame.getmaxyx()
+        steps = self.__steps__.get(size)
+        if steps is None:
+            steps = self.__steps__[size] = self.__make_steps__(*size)
+        return iter(steps)
+
+
+def move(y0: int, x0: int, y1: int, x1: int, string, duration: int,
+         easing="linear", col: int = None, erase: bool = True):
+    """Move *string* from (y0, x0) to (y1, x1) in *duration* steps.
+    Args:
+        y0 (int): The line of the start.
+        x0 (int): The column of the start.
+        y1 (int): The line of the end.
+        x1 (int): The column of the end.
+        string (str or Sprite): The text to move (see *Motion*).
+        duration (int): The number of steps of the motion.
+        easing (str or function): The easing of the motion (see EASINGS).
+        col (int): The color of the text.
+        erase (bool): Erase the cells that the text leaves (see *Motion*).
+    Returns:
+        Motion: The corresponding animation function.
+    """
+    dy, dx = y1 - y0, x1 - x0
+    path = [(round(y0 + dy * progress), round(x0 + dx * progress))
+            for progress in easing_table(easing, int(duration))]
+    return Motion(string, path, col, "move", erase)
+
+
+def move_along(points, string, duration: int, easing="linear",
+               col: int = None, erase: bool = True):
+    """Move *string* along the line that goes through *points*, in *duration*
+    steps. Each part of the line takes a time proportional to its length.
+    Args:
+        points (list[tuple[int, int]]): The (y, x) points of the line.
+        string (str or Sprite): The text to move (see *Motion*).
+        duration (int): The number of steps of the motion.
+        easing (str or function): The easing of the whole motion (see
+                                  EASINGS).
+        col (int): The color of the text.
+        erase (bool): Erase the cells that the text leaves (see *Motion*).
+    Returns:
+        Motion: The corresponding animation function.
+    """
+    points = [(float(y), float(x)) for y, x in points]
+    # distance from the first point to each point
+    distances = [0.0]
+    for (y0, x0), (y1, x1) in zip(points, points[1:]):
+        distances.append(distances[-1] + hypot(y1 - y0, x1 - x0))
+    total = distances[-1]
+    path = []
+    for progress in easing_table(easing, int(duration)):
+        distance = progress * total
+        index = min(bisect_right(distances, distance), len(points) - 1)
+        if index == 0 or distances[index] == distances[index - 1]:
+            y, x = points[index]
+        else:
+            (y0, x0), (y1, x1) = points[index - 1], points[index]
+            part = ((distance - distances[index - 1])
+                    / (distances[index] - distances[index - 1]))
+            y, x = y0 + (y1 - y0) * part, x0 + (x1 - x0) * part
+        path.append((round(y), round(x)))
+    return Motion(string, path, col, "move_along", erase)
 
 
 # ╻ ╻╻┏━╸╻ ╻┏━╸┏━┓   ┏━┓┏━┓╺┳┓┏━╸┏━┓
@@ -138,57 +518,113 @@ def color_ramp(y: int, x: int, string: str, col_ramp: list[int]):
 # ╹ ╹╹┗━┛╹ ╹┗━╸╹┗╸   ┗━┛╹┗╸╺┻┛┗━╸╹┗╸
 # function to modify animations
 
-def repeat(anim, times: int =-1):
+# maximum number of steps of a cycle that *repeat* keeps in memory
+REPEAT_CACHE_LIMIT = 100_000
+
+def repeat(anim, times: int =-1, cache: bool =True):
     """Repeat *times* times the animation *anim*.
+    The steps of the first cycle are kept, and the next cycles replay them
+    instead of running the animation again. Animations that do not give the
+    same steps each time they are played (random ones for example) must be
+    repeated with *cache* set to False. A cycle longer than
+    REPEAT_CACHE_LIMIT steps is not kept either.
     Args:
         anim (Anim): The animation to repeat.
         times (int): The number of repetitions. Default to -1 that means
                      endless repetitions (as any negative number).
+        cache (bool): Replay the steps of the first cycle instead of running
+                      the animation again (defaults to True).
     Returns:
         function: The animation repeated *times* times.
     """
     def repeat_generator(frame):
-        if times < 0:
-            while True:
-                animation = anim(frame)
-                yield from animation
-                del animation
-        else:
-            for _ in range(int(times)):
-                animation = Anim(frame, anim)
-                yield from (animation & animation)(frame)
-                del animation
+        count = int(times)
+        steps = [] if cache else None
+        while count != 0:
+            for modif_list in Anim(frame, anim):
+                if steps is not None:
+                    if len(steps) >= REPEAT_CACHE_LIMIT:
+                        steps = None
+                    elif type(modif_list) is Idle:
+                        steps.append(modif_list)
+                    else:
+                        steps.append(list(modif_list))
+                yield modif_list
+            count -= 1
+            if steps is not None:
+                break
+        if not steps:
+            return
+        # the next cycles replay the steps of the first one
+        while count != 0:
+            yield from steps
+            count -= 1
     return repeat_generator
 
-def Repeat(frame, anim, times: int =-1):
+def Repeat(frame, anim, times: int =-1, cache: bool =True):
     """Repeat *times* times the animation *anim*.
     Args:
         anim (Anim): The animation to repeat.
         times (int): The number of repetitions. Default to -1 that means
                      endless repetitions (as any negative number).
+        cache (bool): Replay the steps of the first cycle instead of running
+                      the animation again (defaults to True).
     Returns:
         function: The animation repeated *times* times.
     """
-    return Anim(frame, repeat(anim, times))
+    return Anim(frame, repeat(anim, times, cache))
 
 
-def slow(anim, factor: int =2):
+def slow(anim, factor=2):
     """Slow *factor* times the animation *anim*.
+    Each step of *anim* lasts *factor* steps. The factor can be fractional :
+    the steps last *factor* steps on average, and a factor below 1 speeds the
+    animation up (the steps that get no time of their own are drawn with the
+    next one).
     Args:
         anim (Anim or function): The animation to repeat.
-        factor (int): The slowing factor (defaults to 2).
+        factor (int, float or Fraction): The slowing factor (defaults to 2).
     Returns:
         function: The animation slowed.
+    Raises:
+        ValueError: If *factor* is not positive.
     """
+    ratio = Fraction(factor).limit_denominator(1000)
+    if ratio <= 0:
+        raise ValueError("The slowing factor must be positive")
+    numerator, denominator = ratio.numerator, ratio.denominator
     def slow_generator(frame):
-        anim_generator = anim(frame)
-        while True:
-            try:
-                step = next(anim_generator)
-                for _ in range(factor):
-                    yield step
-            except StopIteration:
-                return
+        # steps of *anim*, and of the slowed animation, so far
+        ticks = shown = 0
+        # modifications of the steps that did not get any time
+        pending = None
+        for step in anim(frame):
+            if not isinstance(step, list):
+                # a single modification, like *Anim* accepts it
+                step = [step]
+            idle = type(step) is Idle
+            ticks += step.ticks if idle else 1
+            length = ticks * numerator // denominator - shown
+            if length == 0:
+                if not idle:
+                    pending = step if pending is None else [*pending, *step]
+                continue
+            shown += length
+            if idle:
+                if pending is not None:
+                    yield pending
+                    pending = None
+                    length -= 1
+                if length:
+                    yield Idle(length)
+                continue
+            if pending is not None:
+                step = [*pending, *step]
+                pending = None
+            # the step is drawn again at each tick, even if it only writes
+            # data : in a composition, an upper layer may have drawn over it
+            for _ in range(length):
+                yield step
+        if pending is not None:
+            yield pending
     return slow_generator
-
-
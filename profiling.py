@@ -0,0 +1,111 @@
+"""
+Module to measure where the time goes while an animation is played.
+A *Profiler* given to *play* records, for each frame, the time taken by the
+step of the animation (and by each layer of its compositions), by the
+application of the modifications, and by the refresh of the screen, and the
+number of modifications.
+"""
+import json
+from bisect import bisect_left
+
+# upper bounds of the histogram buckets, in seconds (1µs to about 1s)
+BUCKETS = [1e-6 * 2 ** i for i in range(21)] + [float("inf")]
+# upper bounds of the histogram buckets for counts
+COUNT_BUCKETS = [0] + [2 ** i for i in range(16)] + [float("inf")]
+
+
+class Histogram:
+    """Counts of durations (or of any value) by bucket."""
+
+    def __init__(self, bounds: list[float] = BUCKETS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.total = 0.
+        self.maximum = 0.
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+        if value > self.maximum:
+            self.maximum = value
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.,
+            "max": self.maximum,
+            "buckets": [[bound if bound != float("inf") else None, count]
+                        for bound, count in zip(self.bounds, self.counts)
+                        if count],
+        }
+
+
+class Profiler:
+    def __init__(self, callback=None) -> None:
+        """Initialize the profiler.
+        Args:
+            callback (function): Called at the end of each frame with a dict :
+                                 {"step", "apply", "refresh": seconds,
+                                  "modifications": int,
+                                  "layers": {layer name: seconds}}
+                                 ("refresh" is None for a dropped frame).
+        """
+        self.callback = callback
+        self.frames = 0
+        # metric name -> Histogram
+        self.histograms = {}
+        # layer name -> seconds spent in the current frame
+        self.__layers__ = {}
+
+    def __record__(self, metric: str, value: float,
+                   bounds: list[float] = BUCKETS) -> None:
+        histogram = self.histograms.get(metric)
+        if histogram is None:
+            histogram = self.histograms[metric] = Histogram(bounds)
+        histogram.add(value)
+
+    def record_layer(self, name: str, seconds: float) -> None:
+        """Record the time a layer took to give its step, in the current
+        frame."""
+        self.__layers__[name] = self.__layers__.get(name, 0.) + seconds
+
+    def end_frame(self, step: float, apply: float, refresh: float,
+                  modifications: int) -> None:
+        """Record the measures of a frame.
+        Args:
+            step (float): The time taken to compute the step.
+            apply (float): The time taken to apply the modifications.
+            refresh (float): The time taken to refresh the screen, or None if
+                             the frame was dropped.
+            modifications (int): The number of modifications of the step.
+        """
+        self.frames += 1
+        layers, self.__layers__ = self.__layers__, {}
+        self.__record__("step", step)
+        self.__record__("apply", apply)
+        if refresh is not None:
+            self.__record__("refresh", refresh)
+        self.__record__("modifications", modifications, COUNT_BUCKETS)
+        for name, seconds in layers.items():
+            self.__record__(f"layer {name}", seconds)
+        if self.callback is not None:
+            self.callback({"step": step, "apply": apply, "refresh": refresh,
+                           "modifications": modifications, "layers": layers})
+
+    def histogram(self, metric: str) -> Histogram:
+        """Return the histogram of a metric ("step", "apply", "refresh",
+        "modifications" or "layer <name>")."""
+        return self.histograms[metric]
+
+    def to_dict(self) -> dict:
+        return {"frames": self.frames,
+                "metrics": {metric: histogram.to_dict()
+                            for metric, histogram in self.histograms.items()}}
+
+    def export_json(self, path: str) -> None:
+        """Write all the histograms to a JSON file."""
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
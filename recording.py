@@ -0,0 +1,228 @@
+"""
+Module to bake an animation into a recording, and to replay it.
+A recording only keeps, for each step, the cells that changed on the screen,
+so replaying it does not run the animation generators at all.
+
+The colors are stored as (foreground, background) numbers rather than as
+color pairs, since the pairs depend on the frame that the recording is
+played on.
+
+File format (little endian, every array aligned on the size of its items):
+    header          magic, height, width, number of steps, of runs, of
+                    strings, of colors
+    attrs           uint64 per run, without the color pair
+    step_offsets    uint32 per step + 1, index of the first run of each step
+    string_ids      uint32 per run, index of the text of the run
+    string_offsets  uint32 per string + 1, offset of each string in the text
+    colors          int16 per color * 2, foreground and background
+    ys, xs          uint16 per run, coordinates of the run
+    color_ids       uint16 per run, index of the color of the run + 1 (0 for
+                    the default colors)
+    text            the utf-8 encoded strings, one after the other
+"""
+import curses
+import mmap
+import struct
+
+from array import array
+from frame import HeadlessFrame, DrawBatch
+from colors import COLOR_SHIFT
+from animations import Anim, Idle
+
+MAGIC = b"ANIMREC2"
+# magic, height, width, steps, runs, strings, colors
+HEADER = struct.Struct("<8sIIIIII")
+
+
+class RecordingPlayer:
+    """Iterator over the steps of a recording."""
+
+    def __init__(self, recording) -> None:
+        self.recording = recording
+        self.index = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> list:
+        recording = self.recording
+        if self.index >= len(recording):
+            raise StopIteration
+        offsets = recording.step_offsets
+        if offsets[self.index] == offsets[self.index + 1]:
+            # the steps with no change are given as one idle step, so that
+            # the player does not refresh the screen for them
+            start = self.index
+            while (self.index < len(recording)
+                   and offsets[self.index] == offsets[self.index + 1]):
+                self.index += 1
+            return Idle(self.index - start)
+        batch = recording.get_batch(self.index)
+        self.index += 1
+        return [batch]
+
+
+class Recording:
+    def __init__(self, data) -> None:
+        """Initialize the recording from its binary data.
+        Args:
+            data (bytes-like): The content of a recording file (it can be a
+                               memory map, that is only read when needed).
+        Raises:
+            ValueError: If *data* is not a recording.
+        """
+        self.__data__ = data
+        view = memoryview(data)
+        (magic, self.height, self.width, steps, runs, strings,
+         colors) = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("This is not an animation recording")
+        offset = HEADER.size
+
+        def take(fmt: str, count: int):
+            nonlocal offset
+            size = struct.calcsize(fmt) * count
+            part = view[offset:offset + size].cast(fmt)
+            offset += size
+            return part
+
+        self.attrs = take("Q", runs)
+        self.step_offsets = take("I", steps + 1)
+        self.string_ids = take("I", runs)
+        self.string_offsets = take("I", strings + 1)
+        pairs = take("h", 2 * colors)
+        self.ys = take("H", runs)
+        self.xs = take("H", runs)
+        self.color_ids = take("H", runs)
+        # color id -> color given to the frame (None for no color)
+        self.colors = [None] + [(pairs[2 * index], pairs[2 * index + 1])
+                                for index in range(colors)]
+        self.text = view[offset:offset + self.string_offsets[strings]]
+        # strings are only decoded the first time they are used
+        self.__strings__ = [None] * strings
+
+    @classmethod
+    def load(cls, path: str):
+        """Load a recording file, by mapping it in memory.
+        Args:
+            path (str): The path of the file.
+        Returns:
+            Recording: The recording.
+        """
+        with open(path, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data)
+
+    def __len__(self) -> int:
+        """Return the number of steps of the recording."""
+        return len(self.step_offsets) - 1
+
+    def __call__(self, frame):
+        """A recording is an animation function : calling it on a frame gives
+        an iterator over its steps."""
+        return RecordingPlayer(self)
+
+    def get_string(self, index: int) -> str:
+        string = self.__strings__[index]
+        if string is None:
+            start = self.string_offsets[index]
+            stop = self.string_offsets[index + 1]
+            string = str(self.text[start:stop], "utf-8")
+            self.__strings__[index] = string
+        return string
+
+    def get_batch(self, index: int) -> DrawBatch:
+        """Return the step *index* as a batch of writes. The coordinates and
+        the attributes are read from the recording without being copied."""
+        start = self.step_offsets[index]
+        stop = self.step_offsets[index + 1]
+        cols = None
+        if len(self.colors) > 1:
+            colors = self.colors
+            cols = [colors[color_id]
+                    for color_id in self.color_ids[start:stop]]
+        return DrawBatch(self.ys[start:stop], self.xs[start:stop],
+                         [self.get_string(self.string_ids[run])
+                          for run in range(start, stop)],
+                         self.attrs[start:stop], cols)
+
+    def get_step(self, index: int) -> list[tuple[int, int, str, int, tuple]]:
+        """Return the (y, x, string, attr, col) runs of the step *index*, col
+        being the (fg, bg) colors of the run or None."""
+        return [(self.ys[run], self.xs[run],
+                 self.get_string(self.string_ids[run]), self.attrs[run],
+                 self.colors[self.color_ids[run]])
+                for run in range(self.step_offsets[index],
+                                 self.step_offsets[index + 1])]
+
+
+def record(animation, height: int = 24, width: int = 80) -> bytes:
+    """Play an animation on a *HeadlessFrame*, and return the recording of
+    the cells that changed at each step.
+    Args:
+        animation (Anim or function): The animation to record.
+        height (int): The number of lines of the screen.
+        width (int): The number of columns of the screen.
+    Returns:
+        bytes: The content of the recording.
+    """
+    frame = HeadlessFrame(height, width)
+    anim = Anim(frame, animation)
+    ys, xs = array("H"), array("H")
+    string_ids, attrs = array("I"), array("Q")
+    color_ids = array("H")
+    step_offsets = array("I", [0])
+    # string -> index in the string table
+    string_table = {}
+    # (fg, bg) -> color id
+    color_table = {}
+    colors_of = frame.colors.colors_of
+    for modif_list in anim:
+        # an Idle step is recorded as as many steps with no change
+        for _ in range(getattr(modif_list, "ticks", 1) - 1):
+            step_offsets.append(len(ys))
+        frame.apply(modif_list)
+        for y, x, string, attr in frame.buffer.changes():
+            ys.append(y)
+            xs.append(x)
+            string_ids.append(string_table.setdefault(string,
+                                                      len(string_table)))
+            pair = (attr & curses.A_COLOR) >> COLOR_SHIFT
+            if pair:
+                color_ids.append(color_table.setdefault(
+                    colors_of(attr), len(color_table) + 1))
+                attr &= ~curses.A_COLOR
+            else:
+                color_ids.append(0)
+            attrs.append(attr)
+        step_offsets.append(len(ys))
+    encoded = [string.encode("utf-8") for string in string_table]
+    string_offsets = array("I", [0])
+    for string in encoded:
+        string_offsets.append(string_offsets[-1] + len(string))
+    colors = array("h")
+    for color in color_table:
+        colors.extend(color)
+    return b"".join((
+        HEADER.pack(MAGIC, height, width, len(step_offsets) - 1, len(ys),
+                    len(encoded), len(color_table)),
+        attrs.tobytes(), step_offsets.tobytes(), string_ids.tobytes(),
+        string_offsets.tobytes(), colors.tobytes(), ys.tobytes(),
+        xs.tobytes(), color_ids.tobytes(),
+        *encoded,
+    ))
+
+
+def bake(animation, path: str, height: int = 24, width: int = 80):
+    """Record an animation into the file *path*, and load the recording.
+    Args:
+        animation (Anim or function): The animation to record.
+        path (str): The path of the recording file.
+        height (int): The number of lines of the screen.
+        width (int): The number of columns of the screen.
+    Returns:
+        Recording: The recording, that can be given to *play*.
+    """
+    with open(path, "wb") as file:
+        file.write(record(animation, height, width))
+    return Recording.load(path)
@@ -0,0 +1,95 @@
+"""
+Module that defines the clock of the animation player.
+Frames are scheduled on fixed deadlines taken from a monotonic clock, so that
+slow frames do not make the whole animation drift.
+"""
+from time import monotonic, sleep
+
+
+class PlaybackStats:
+    """Statistics about one run of an animation."""
+
+    def __init__(self) -> None:
+        # number of frames that were refreshed on the screen
+        self.frames_rendered = 0
+        # number of frames whose modifications were applied, but that were
+        # not refreshed because they were already late
+        self.frames_dropped = 0
+        # worst delay (in seconds) between a deadline and the end of the frame
+        self.worst_lateness = 0.
+        # number of frames where nothing changed, and that were not refreshed
+        self.frames_idle = 0
+        # number of times the player had to wait for a step to be computed,
+        # when the steps are computed ahead (see *Lookahead*)
+        self.queue_underruns = 0
+
+    def __repr__(self) -> str:
+        return (f"PlaybackStats(frames_rendered={self.frames_rendered}, "
+                f"frames_dropped={self.frames_dropped}, "
+                f"frames_idle={self.frames_idle}, "
+                f"worst_lateness={self.worst_lateness:.4f}, "
+                f"queue_underruns={self.queue_underruns})")
+
+
+class FrameScheduler:
+    def __init__(self, fps: float, max_dropped: int = 5) -> None:
+        """Initialize the scheduler.
+        Args:
+            fps (float): The target number of frames per second.
+            max_dropped (int): The maximum number of frames that can be dropped
+                               in a row. The next one is rendered even if it
+                               is late, so that the screen is still updated
+                               when every frame is too slow.
+        Raises:
+            ValueError: If *fps* is not strictly positive.
+        """
+        if fps <= 0:
+            raise ValueError("The *fps* parameter must be strictly positive")
+        self.period = 1 / fps
+        self.max_dropped = int(max_dropped)
+        self.stats = PlaybackStats()
+        self.__start__ = None
+        self.__frame_index__ = 0
+        self.__dropped_in_row__ = 0
+
+    def start(self) -> None:
+        """Start the clock. The first frame is due one period from now."""
+        self.__start__ = monotonic()
+        self.__frame_index__ = 0
+        self.__dropped_in_row__ = 0
+
+    def next_deadline(self) -> float:
+        """Return the (monotonic) time at which the current frame ends."""
+        return self.__start__ + (self.__frame_index__ + 1) * self.period
+
+    def should_render(self) -> bool:
+        """Tell if the current frame has to be refreshed on the screen.
+        A frame that is already past its deadline is dropped, unless too many
+        frames were already dropped in a row.
+        Returns:
+            bool: True if the frame must be rendered.
+        """
+        lateness = monotonic() - self.next_deadline()
+        if lateness > self.stats.worst_lateness:
+            self.stats.worst_lateness = lateness
+        if lateness > 0 and self.__dropped_in_row__ < self.max_dropped:
+            self.__dropped_in_row__ += 1
+            self.stats.frames_dropped += 1
+            return False
+        self.__dropped_in_row__ = 0
+        self.stats.frames_rendered += 1
+        return True
+
+    def wait(self, frames: int = 1) -> None:
+        """Sleep until the deadline of the current frame, then go to the next
+        frame. Does not sleep at all if the deadline is already passed.
+        Args:
+            frames (int): The number of frames to wait for. The frames after
+                          the current one are idle : nothing is drawn, so the
+                          scheduler sleeps until the end of the last one.
+        """
+        self.__frame_index__ += frames - 1
+        remaining = self.next_deadline() - monotonic()
+        if remaining > 0:
+            sleep(remaining)
+        self.__frame_index__ += 1
@@ -0,0 +1,212 @@
+"""
+Tests of the compositions and of the optimizer : culling the hidden writes and
+compiling an animation must not change what is drawn on the screen.
+Run them with :
+    python -m unittest test_animations
+"""
+import random
+import unittest
+
+from frame import HeadlessFrame
+from animations import Anim, Composition, Idle
+from colors import split_color
+from optimizer import compile_animation
+from parallel import ProcessLayer
+from primitives import (Sprite, Wait, addstr, color_ramp, fadein, fadeout,
+                        idle, move, repeat, slow, sprite, text)
+
+HEIGHT, WIDTH = 6, 20
+
+
+def random_leaf(rng, frame):
+    """Return a random simple animation, that may be delayed."""
+    y = rng.randrange(HEIGHT)
+    x = rng.randrange(-3, WIDTH)
+    string = "#" * rng.randrange(8) + str(rng.randrange(10))
+    if rng.random() < 0.1:
+        string += "\n" + string[::-1]
+    if rng.random() < 0.01:
+        # computed by a worker process
+        return Anim(frame, ProcessLayer(fadein, y, x, string))
+    kind = rng.randrange(11)
+    if kind == 0:
+        function = text(y, x, string, rng.choice([None, 3, (4, 5)]))
+    elif kind == 1:
+        function = fadein(y, x, string)
+    elif kind == 2:
+        function = fadeout(y, x, string)
+    elif kind == 3:
+        function = color_ramp(y, x, string, [rng.randrange(256) for _ in
+                                             range(rng.randrange(1, 20))])
+    elif kind == 4:
+        function = move(y, x, rng.randrange(HEIGHT), rng.randrange(WIDTH),
+                        string, rng.randrange(1, 15), "in_out")
+    elif kind == 5:
+        function = addstr("zz")
+    elif kind == 6:
+        function = slow(random_leaf(rng, frame), rng.choice([2, 3, 0.5, 1.5]))
+    elif kind == 7:
+        function = repeat(random_leaf(rng, frame), rng.randrange(1, 4),
+                          rng.random() < 0.5)
+    elif kind == 8:
+        function = sprite(y, x, [string, string[::-1], " " + string])
+    elif kind == 9:
+        function = Wait(frame, random_leaf(rng, frame), rng.randrange(5))
+    else:
+        function = idle(rng.randrange(1, 6))
+    return Anim(frame, function, after=rng.choice([0, 0, 0, 1, 4]))
+
+
+def random_scene(rng, frame, depth: int = 3):
+    """Return a random tree of compositions and sequences."""
+    if depth == 0 or rng.random() < 0.3:
+        return random_leaf(rng, frame)
+    anim = random_scene(rng, frame, depth - 1)
+    for _ in range(rng.randrange(1, 4)):
+        other = random_scene(rng, frame, depth - 1)
+        if rng.random() < 0.5:
+            anim = anim >> other
+        else:
+            anim = anim & other
+    if rng.random() < 0.2:
+        anim = anim.delayed(rng.randrange(1, 4))
+    return anim
+
+
+def screens(anim, frame):
+    """Play *anim* on *frame*, and return the screen after each tick. The
+    cells are compared by their colors, since the pair of a color depends on
+    the order in which the colors were first used."""
+    result = []
+    for modif_list in anim:
+        frame.apply(modif_list)
+        screen = ([(y, x, string, split_color(attr)[0],
+                    frame.colors.colors_of(attr))
+                   for y, x, string, attr in frame.buffer.get_runs()],
+                  frame.cursor)
+        result.extend([screen] * getattr(modif_list, "ticks", 1))
+    return result
+
+
+class TestComposition(unittest.TestCase):
+    def tearDown(self):
+        Composition.culling = True
+
+    def test_culling(self):
+        """The culled steps draw the same screens as the whole steps."""
+        for seed in range(100):
+            with self.subTest(seed=seed):
+                Composition.culling = False
+                frame = HeadlessFrame(HEIGHT, WIDTH)
+                expected = screens(random_scene(random.Random(seed), frame),
+                                   frame)
+                Composition.culling = True
+                frame = HeadlessFrame(HEIGHT, WIDTH)
+                self.assertEqual(
+                    screens(random_scene(random.Random(seed), frame), frame),
+                    expected)
+
+
+    def test_idle_layers(self):
+        """A layer that is idle for a while is not asked for its steps, but
+        the composition keeps its duration."""
+        asked = []
+
+        def waiting(frame):
+            asked.append(1)
+            yield Idle(10)
+            asked.append(2)
+            yield []
+
+        frame = HeadlessFrame(HEIGHT, WIDTH)
+        anim = Anim(frame, waiting) >> Anim(frame, text(0, 0, "a"))
+        steps = list(anim)
+        self.assertEqual(asked, [1, 2])
+        self.assertEqual(sum(getattr(step, "ticks", 1) for step in steps), 11)
+
+
+class TestPrimitives(unittest.TestCase):
+    def test_slow_under_a_layer(self):
+        """A slowed layer draws again at each tick, over what the layers
+        above it drew in between."""
+        def upper(frame):
+            yield []
+            yield [lambda frame: frame.put_text(0, 0, "Y")]
+            yield []
+
+        frame = HeadlessFrame(HEIGHT, WIDTH)
+        anim = Anim(frame, slow(text(0, 0, "X"), 3)) >> Anim(frame, upper)
+        shown = []
+        for modif_list in anim:
+            frame.apply(modif_list)
+            shown.append(frame.buffer.get_line(0)[0])
+        self.assertEqual(shown, ["X", "Y", "X"])
+
+    def test_slow_single_modification(self):
+        """A step can be a single modification instead of a list."""
+        def single(frame):
+            yield lambda frame: frame.put_text(0, 0, "a")
+
+        frame = HeadlessFrame(HEIGHT, WIDTH)
+        for modif_list in Anim(frame, slow(single, 2)):
+            frame.apply(modif_list)
+        self.assertEqual(frame.buffer.get_line(0)[0], "a")
+
+
+    def test_sprite_clipping(self):
+        """A sprite only writes the cells that are on the screen."""
+        image = Sprite(["abcdefghij", "kl mn"])
+        def writes(y, x):
+            batch = image.blit(y, x, 5, 20)
+            return list(zip(batch.ys, batch.xs, batch.strings))
+
+        self.assertEqual(writes(0, 25), [])
+        self.assertEqual(writes(0, -12), [])
+        self.assertEqual(writes(0, 17), [(0, 17, "abc"), (1, 17, "kl")])
+        self.assertEqual(writes(4, -3), [(4, 0, "defghij")])
+        self.assertEqual(writes(-1, -3), [(0, 0, "mn")])
+
+class TestOptimizer(unittest.TestCase):
+    def test_equivalence(self):
+        """The compiled animations draw the same screens as the original
+        ones."""
+        for seed in range(400):
+            with self.subTest(seed=seed):
+                frame = HeadlessFrame(HEIGHT, WIDTH)
+                anim = random_scene(random.Random(seed), frame)
+                expected = screens(anim.clone(), frame)
+                frame = HeadlessFrame(HEIGHT, WIDTH)
+                anim = random_scene(random.Random(seed), frame)
+                self.assertEqual(screens(compile_animation(anim), frame),
+                                 expected)
+
+
+    def test_segment_index(self):
+        """The compiled sequence gives the index of the segment being
+        played to the original one, even when it merged the ramps of
+        several segments."""
+        def indices(anim, sequence):
+            result = []
+            for step in anim:
+                result.extend([sequence.segment_index]
+                              * getattr(step, "ticks", 1))
+            return result + [sequence.segment_index]
+
+        def make_sequence(frame, delay):
+            return (Anim(frame, fadein(0, 0, "a"), after=delay)
+                    & Anim(frame, fadeout(0, 0, "a"))
+                    & Anim(frame, text(1, 0, "b")))
+
+        frame = HeadlessFrame(HEIGHT, WIDTH)
+        for delay in (0, 3):
+            sequence = make_sequence(frame, delay)
+            expected = indices(sequence, sequence)
+            sequence = make_sequence(frame, delay)
+            compiled = compile_animation(sequence)
+            # the two ramps are merged
+            self.assertEqual(len(compiled.segments), 2)
+            self.assertEqual(indices(compiled, sequence), expected)
+            self.assertEqual(expected[-1], 3)
+
+if __name__ == "__main__":
+    unittest.main()